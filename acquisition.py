@@ -0,0 +1,271 @@
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from framing import FrameReader
+from teensy_records import RECORD_BYTES
+
+
+QUEUE_SIZE = 64    # packets buffered per consumer (~2 MB of dual-rate records)
+
+STREAM_RX_BUFFER = 1 << 20   # bytes; room for ~30 dual-rate packets in the driver
+STREAM_SETTLE_S = 0.5        # wait after 'X' for the packet in flight before flushing
+
+# seq:       running packet number assigned by the acquisition thread
+# timestamp: time.time() when the packet finished arriving
+# raw:       the packet bytes
+Packet = namedtuple('Packet', ['seq', 'timestamp', 'raw'])
+
+
+def set_framing(ser, framed):
+    """Switch the Teensy's framed packets on or off; returns a FrameReader if on."""
+    ser.write(b'F' + (b'\x01' if framed else b'\x00'))
+    return FrameReader(ser) if framed else None
+
+
+class TriggeredReader:
+    """
+    Request-response packet source: send the trigger byte, then read one whole packet.
+
+
+    Every packet source used with AcquisitionThread has the same read() method, returning
+    the packet bytes, None for a short or bad packet, or raising EOFError once the source
+    is exhausted. A source may also have close(), called when acquisition ends.
+
+
+    Parameters:
+        ser (serial.Serial): Open port with a read timeout longer than one measurement.
+        nbytes (int): Packet size.
+        command (bytes): Trigger sent before each packet.
+        framed (bool): Ask for framed packets ('F' 1) and read them with a FrameReader.
+    """
+
+    def __init__(self, ser, nbytes=RECORD_BYTES, command=b'S', framed=False):
+        self.ser = ser
+        self.nbytes = nbytes
+        self.command = command
+        self.frames = set_framing(ser, framed)
+
+    def read(self):
+        self.ser.write(self.command)
+        if self.frames is not None:
+            # a bad frame is the whole answer to this trigger; return so the next one goes out now
+            return self.frames.read(stop_on_error=True)
+        buf = self.ser.read(self.nbytes)   # blocks until the packet is complete or times out
+        return buf if len(buf) == self.nbytes else None
+
+
+class StreamReader:
+    """
+    Free-running packet source: the Teensy measures and sends until told to stop.
+
+
+    start() sets the period and sends 'C'; read() just takes the next packet off the stream,
+    so there is no per-run command round trip. Framed packets resynchronise by themselves;
+    with raw packets a short read stops, flushes and restarts the stream so the next packet
+    starts on a record boundary.
+
+
+    Parameters:
+        ser (serial.Serial): Open port with a read timeout longer than one period.
+        nbytes (int): Packet size.
+        period_ms (int): Time between measurement starts on the Teensy (0 = back to back).
+        rx_buffer (int): Driver receive buffer requested where supported (Windows).
+        framed (bool): Ask for framed packets ('F' 1) and read them with a FrameReader.
+    """
+
+    def __init__(self, ser, nbytes=RECORD_BYTES, period_ms=0, rx_buffer=STREAM_RX_BUFFER,
+                 framed=False):
+        self.ser = ser
+        self.nbytes = nbytes
+        self.period_ms = int(period_ms)
+        if hasattr(ser, 'set_buffer_size'):
+            ser.set_buffer_size(rx_size=rx_buffer)
+        self.frames = set_framing(ser, framed)
+        self.running = False
+
+    def start(self):
+        self.ser.write(b'P' + struct.pack('<I', self.period_ms))
+        self.ser.write(b'C')
+        self.running = True
+
+    def stop(self):
+        """Stop streaming and discard whatever is still in flight."""
+        self.ser.write(b'X')
+        self.running = False
+        time.sleep(STREAM_SETTLE_S)
+        self.ser.reset_input_buffer()
+
+    def read(self):
+        if not self.running:
+            self.start()
+        if self.frames is not None:
+            return self.frames.read()
+        buf = self.ser.read(self.nbytes)
+        if len(buf) == self.nbytes:
+            return buf
+        self.stop()   # realign: the next start() begins with a fresh packet
+        return None
+
+    def close(self):
+        if self.running:
+            self.stop()
+
+
+def put_latest(q, item):
+    """
+    Put item without blocking, discarding the oldest queued item if q is full.
+
+
+    Returns:
+        bool: True if an item had to be discarded.
+    """
+    try:
+        q.put_nowait(item)
+        return False
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        q.put_nowait(item)
+        return True
+
+
+def drain(q):
+    """All items currently in q, oldest first, without blocking."""
+    items = []
+    while True:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            return items
+
+
+class AcquisitionThread(threading.Thread):
+    """
+    Producer thread that does nothing but read packets and hand them to consumer queues.
+
+
+    Each subscribe() call adds a bounded queue that receives every Packet. A lossless queue
+    (persistence, analysis) applies back-pressure when full; a lossy one (live display) drops
+    its oldest packet instead, so a slow consumer never holds up the next acquisition. When
+    the source is exhausted or stop() is called, the reader is closed and None is queued to
+    every subscriber.
+
+
+    Parameters:
+        reader: Packet source with a read() method (see TriggeredReader).
+        name (str): Thread name.
+    """
+
+    def __init__(self, reader, name='acquisition'):
+        super().__init__(name=name, daemon=True)
+        self.reader = reader
+        self._subscribers = []
+        self._stop_event = threading.Event()
+        self.n_packets = 0
+        self.n_bad = 0
+        self.n_dropped = 0
+        self.started_at = None
+
+    def subscribe(self, maxsize=QUEUE_SIZE, lossy=False):
+        """
+        Add a consumer queue; call before start().
+
+
+        Parameters:
+            maxsize (int): Queue bound.
+            lossy (bool): Drop the oldest packet instead of blocking when full.
+
+
+        Returns:
+            queue.Queue: Receives every Packet, then None at the end of the session.
+        """
+        q = queue.Queue(maxsize)
+        self._subscribers.append((q, lossy))
+        return q
+
+    def stop(self):
+        """Ask the thread to finish after the packet currently being read."""
+        self._stop_event.set()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def rate_per_minute(self):
+        """Good packets per minute since start()."""
+        if self.started_at is None:
+            return 0.0
+        elapsed = time.perf_counter() - self.started_at
+        return 60.0 * self.n_packets / elapsed if elapsed > 0 else 0.0
+
+    def _put(self, q, lossy, item):
+        if lossy:
+            self.n_dropped += put_latest(q, item)
+            return
+        while True:
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self.stopped:
+                    put_latest(q, item)
+                    return
+
+    def run(self):
+        self.started_at = time.perf_counter()
+        try:
+            while not self.stopped:
+                try:
+                    raw = self.reader.read()
+                except EOFError:
+                    break
+                if raw is None:
+                    self.n_bad += 1
+                    continue
+                pkt = Packet(self.n_packets, time.time(), raw)
+                self.n_packets += 1
+                for q, lossy in self._subscribers:
+                    self._put(q, lossy, pkt)
+        finally:
+            self._stop_event.set()
+            if hasattr(self.reader, 'close'):
+                self.reader.close()
+            for q, lossy in self._subscribers:
+                self._put(q, lossy, None)
+
+
+class ConsumerThread(threading.Thread):
+    """
+    Run handle(packet) for every packet of a subscriber queue until the end-of-session None.
+
+
+    An exception in handle is kept in self.error and ends the thread.
+
+
+    Parameters:
+        q (queue.Queue): Queue from AcquisitionThread.subscribe.
+        handle (callable): Called with each Packet.
+        name (str): Thread name.
+    """
+
+    def __init__(self, q, handle, name=None):
+        super().__init__(name=name, daemon=True)
+        self.q = q
+        self.handle = handle
+        self.error = None
+
+    def run(self):
+        while True:
+            pkt = self.q.get()
+            if pkt is None:
+                return
+            try:
+                self.handle(pkt)
+            except Exception as e:
+                self.error = e
+                raise
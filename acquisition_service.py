@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import struct
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import serial_asyncio     # pyserial-asyncio
+except ImportError:
+    serial_asyncio = None
+
+from framing import READ_CHUNK, FrameParser
+from packed_log import PACKED_EXT, PackedLogWriter
+from teensy_records import RECORD_BYTES
+
+
+LOG_FLUSH_EVERY = 32  # records per packed-log flush (~1 MB)
+
+logger = logging.getLogger(__name__)
+
+
+# device_id: name of the device the record came from
+# seq:       running record number for that device
+# timestamp: time.time() when the record finished arriving
+# raw:       the record bytes
+DeviceRecord = namedtuple('DeviceRecord', ['device_id', 'seq', 'timestamp', 'raw'])
+
+
+class DeviceStats:
+    """Per-device counters of an AcquisitionService."""
+
+    def __init__(self):
+        self.n_records = 0
+        self.started_at = None
+        self.error = None
+        self.parser = None
+
+    @property
+    def n_lost(self):
+        return self.parser.n_lost if self.parser is not None else 0
+
+    @property
+    def n_crc_errors(self):
+        return self.parser.n_crc_errors if self.parser is not None else 0
+
+    def rate_per_minute(self):
+        if self.started_at is None:
+            return 0.0
+        elapsed = time.perf_counter() - self.started_at
+        return 60.0 * self.n_records / elapsed if elapsed > 0 else 0.0
+
+
+def _close_log(opening):
+    """Close the PackedLogWriter from the future that opened it, if it opened."""
+    if not opening.cancelled() and opening.exception() is None:
+        opening.result().close()
+
+
+async def open_serial(url, baudrate):
+    """(StreamReader, StreamWriter) for a port or pyserial URL, via pyserial-asyncio."""
+    if serial_asyncio is None:
+        raise ImportError("AcquisitionService needs pyserial-asyncio (pip install pyserial-asyncio)")
+    return await serial_asyncio.open_serial_connection(url=url, baudrate=baudrate)
+
+
+class AcquisitionService:
+    """
+    Stream records from several Teensys at once on one asyncio event loop.
+
+
+    Every device is put in free-running mode and read by its own coroutine, so reads from
+    all ports interleave without a thread per device. Each device's records go to its own
+    packed log, <directory>/<device_id>.tlog, written by a per-device writer thread so disk
+    I/O never blocks the event loop, and every record is passed to on_record tagged
+    with its device id. A device that fails to open, disconnects or raises (on_record
+    included) is logged and recorded in its DeviceStats.error without stopping the others.
+
+
+    Parameters:
+        devices (dict): device_id -> port name or pyserial URL, e.g. {'sample': 'COM9', 'reference': 'COM10'}.
+        directory (str): Directory for the packed logs (created if needed).
+        baudrate (int): Port baud rate.
+        framed (bool): Use framed packets (see framing.py) rather than raw ones.
+        period_ms (int): Streaming period on every device (0 = back to back).
+        on_record (callable): Optional callback, called with each DeviceRecord on the event loop.
+        flush_every (int): Flush each packed log after this many records.
+        open_connection (coroutine function): (url, baudrate) -> (StreamReader, StreamWriter);
+            defaults to open_serial.
+    """
+
+    def __init__(self, devices, directory, baudrate=115200, framed=True, period_ms=0,
+                 on_record=None, open_connection=open_serial, flush_every=LOG_FLUSH_EVERY):
+        self.devices = dict(devices)
+        self.directory = directory
+        self.baudrate = baudrate
+        self.framed = framed
+        self.period_ms = int(period_ms)
+        self.on_record = on_record
+        self.open_connection = open_connection
+        self.flush_every = int(flush_every)
+        self.stats = {device_id: DeviceStats() for device_id in self.devices}
+
+    def log_path(self, device_id):
+        return os.path.join(self.directory, device_id + PACKED_EXT)
+
+    async def _records(self, reader, stats):
+        """Yield the device's raw records as they arrive."""
+        if not self.framed:
+            while True:
+                yield await reader.readexactly(RECORD_BYTES)
+        parser = stats.parser = FrameParser()
+        while True:
+            data = await reader.read(READ_CHUNK)
+            if not data:
+                raise EOFError("port closed")
+            parser.feed(data)
+            while (payload := parser.next()) is not None:
+                yield payload
+
+    async def _run_device(self, device_id):
+        stats = self.stats[device_id]
+        try:
+            reader, writer = await self.open_connection(self.devices[device_id], self.baudrate)
+        except Exception as e:
+            stats.error = e
+            logger.error("%s: could not open %s: %r", device_id, self.devices[device_id], e)
+            return
+        # One writer thread per device keeps its appends in order and off the event loop;
+        # the close queued behind them runs only after the last pending append.
+        disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix=device_id)
+        opening = disk.submit(PackedLogWriter, self.log_path(device_id), flush_every=self.flush_every)
+        loop = asyncio.get_running_loop()
+        try:
+            writer.write(b'X' + b'F' + (b'\x01' if self.framed else b'\x00')
+                         + b'P' + struct.pack('<I', self.period_ms) + b'C')
+            await writer.drain()
+            log = await asyncio.wrap_future(opening)
+            stats.started_at = time.perf_counter()
+            async for raw in self._records(reader, stats):
+                await loop.run_in_executor(disk, log.append, raw)
+                rec = DeviceRecord(device_id, stats.n_records, time.time(), raw)
+                stats.n_records += 1
+                if self.on_record is not None:
+                    self.on_record(rec)
+        except Exception as e:
+            # any failure stops this device only; the others keep running
+            stats.error = e
+            logger.error("%s stopped after %d records: %r", device_id, stats.n_records, e)
+        finally:
+            writer.write(b'X')
+            writer.close()
+            await asyncio.wrap_future(disk.submit(_close_log, opening))
+            disk.shutdown(wait=False)
+
+    async def run(self, duration=None):
+        """
+        Acquire from every device until cancelled, all ports close, or duration (s) elapses.
+
+
+        Returns:
+            dict: device_id -> DeviceStats.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        tasks = [asyncio.create_task(self._run_device(d), name=d) for d in self.devices]
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks), duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return self.stats
+
+
+def run_service(devices, directory, duration=None, **kwargs):
+    """Blocking wrapper: run an AcquisitionService with asyncio.run; returns its stats."""
+    return asyncio.run(AcquisitionService(devices, directory, **kwargs).run(duration))
@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+import numpy as np
+
+
+def estimate_capacitance_pf(t_us, v, R_ohm):
+    """Fit ln(v/v0) vs t to get tau, then C = tau/R. Returns pF."""
+    # Basic guards
+    if len(v) < 10 or v[0] <= 0:
+        return np.nan
+    v0 = v[0]
+
+    # Use the falling region where 5%..100% of v0 (avoid tiny tail)
+    mask = (v > 0.05 * v0) & (v < v0) & np.isfinite(v)
+    if mask.sum() < 5:
+        return np.nan
+
+    t = (t_us * 1e-6).astype(float)  # seconds
+    ln_ratio = np.log(v[mask] / v0)
+    # Robust-ish linear fit
+    slope, intercept = np.polyfit(t[mask], ln_ratio, 1)
+    if slope >= 0:
+        return np.nan  # not a decay
+    tau_s = -1.0 / slope
+    C_F = tau_s / float(R_ohm)
+    return C_F * 1e12  # pF
+
+
+# slope (1/s), tau_s (s) and C_pf (pF) of the ln(v/v0) fit per record,
+# rms of its residuals and the number of points used; NaN where the fit failed
+RCFit = namedtuple('RCFit', ['slope', 'tau_s', 'C_pf', 'rms', 'n_points'])
+
+
+def fit_capacitance_batch(t_us, V, R_ohm, lo=0.05, min_points=5, weights=None):
+    """
+    Closed-form least-squares RC fit of many decays at once (batched estimate_capacitance_pf).
+
+
+    For every row, ln(v/v0) is fitted against t over the points with lo*v0 < v < v0, using
+    masked sums instead of per-row boolean indexing and np.polyfit. With weights, each point
+    counts weights times; passing the sample counts of log-resampled records (see
+    log_resample.py) makes the fit of the bins follow the fit of the full records.
+
+
+    Parameters:
+        t_us (ndarray): Time axis in µs, shape (N,) shared by all rows or (n_records, N).
+        V (ndarray): Voltages, shape (n_records, N).
+        R_ohm (float): Discharge resistor (Ω).
+        lo (float): Lower end of the fitted region as a fraction of v0.
+        min_points (int): Fewer masked points than this marks the fit as failed.
+        weights (ndarray): Optional point weights, shape (N,) or (n_records, N).
+
+
+    Returns:
+        RCFit: Arrays of shape (n_records,).
+    """
+    V = np.atleast_2d(np.asarray(V, dtype=float))
+    t = np.broadcast_to(np.asarray(t_us, dtype=float), V.shape)
+    w = None if weights is None else np.broadcast_to(np.asarray(weights, dtype=float), V.shape)
+    v0 = V[:, :1]
+
+    # Only the columns some row actually fits are needed for the sums
+    m = (V > lo * v0) & (V < v0)
+    cols = np.flatnonzero(m.any(axis=0))
+    span = slice(cols[0], cols[-1] + 1) if cols.size else slice(0, 0)
+    m, V, t = m[:, span], V[:, span], t[:, span] * 1e-6   # seconds
+    mw = m if w is None else m * w[:, span]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = m.sum(axis=1)
+        sw = np.sum(mw, axis=1)
+        y = np.log(np.where(m, V / v0, 1.0))     # zero outside the mask
+        t_mean = np.sum(mw * t, axis=1) / sw
+        dt = np.where(m, t - t_mean[:, None], 0.0)
+        slope = np.sum(mw * dt * y, axis=1) / np.sum(mw * dt * dt, axis=1)
+        intercept = np.sum(mw * y, axis=1) / sw - slope * t_mean
+        resid = np.where(m, y - intercept[:, None] - slope[:, None] * t, 0.0)
+        rms = np.sqrt(np.sum(mw * resid * resid, axis=1) / sw)
+
+    fitted = (n >= min_points) & (v0[:, 0] > 0)
+    ok = fitted & (slope < 0)
+    tau_s = np.where(ok, -1.0 / np.where(ok, slope, -1.0), np.nan)
+    return RCFit(np.where(fitted, slope, np.nan), tau_s, tau_s / float(R_ohm) * 1e12,
+                 np.where(fitted, rms, np.nan), n)
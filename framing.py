@@ -0,0 +1,177 @@
+import zlib
+
+import numpy as np
+
+from teensy_records import LAYOUTS
+
+
+# A frame wraps one raw record:
+#   FRAME_HEADER | payload (length bytes) | CRC32 (<u4)
+# The CRC (zlib / IEEE 802.3) covers everything after the sync word up to the CRC itself,
+# so a corrupted header is caught as well as a corrupted payload.
+SYNC = b'\xa5\x5a\xc3\x3c'
+CRC_BYTES = 4
+
+FRAME_HEADER = np.dtype([
+    ('sync',    'S4'),
+    ('version', '<u2'),     # payload layout, see FRAME_LAYOUTS
+    ('length',  '<u4'),     # payload bytes
+    ('seq',     '<u4'),     # increments by one per frame sent, wraps at 2**32
+])                          # 14 bytes
+
+# Frame version -> teensy_records layout of the payload
+FRAME_LAYOUTS = {1: 'dual_rate'}
+FRAME_VERSION = 1
+
+READ_CHUNK = 1 << 16
+
+
+def encode_frame(payload, seq, version=FRAME_VERSION):
+    """
+    Wrap one raw record in a frame, as the firmware does.
+
+
+    Parameters:
+        payload (bytes-like): Raw record.
+        seq (int): Sequence number (taken modulo 2**32).
+        version (int): Frame version, a key of FRAME_LAYOUTS.
+
+
+    Returns:
+        bytes: The frame.
+    """
+    hdr = np.zeros(1, dtype=FRAME_HEADER)
+    hdr['sync'] = SYNC
+    hdr['version'] = version
+    hdr['length'] = len(payload)
+    hdr['seq'] = seq % 2**32
+    body = hdr.tobytes()[len(SYNC):] + bytes(payload)
+    return SYNC + body + np.uint32(zlib.crc32(body)).astype('<u4').tobytes()
+
+
+class FrameParser:
+    """
+    Incremental frame parser: feed() it bytes as they arrive, next() returns whole payloads.
+
+
+    Bytes before a sync word are skipped, a header with an unknown version or a length that
+    does not match its layout is treated as a false sync, and a frame whose CRC fails is
+    dropped; in each case parsing resumes at the next sync word, so a corrupted or
+    truncated packet costs one record rather than leaving the stream misaligned. Gaps in
+    the sequence numbers are counted in n_lost.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.need = FRAME_HEADER.itemsize   # bytes next() is waiting for
+        self.last_seq = None
+        self.last_version = None
+        self.n_frames = 0
+        self.n_crc_errors = 0
+        self.n_false_syncs = 0  # headers rejected for an unknown version or bad length
+        self.n_skipped = 0      # bytes discarded while resynchronising
+        self.n_lost = 0         # frames missing according to the sequence numbers
+
+    def feed(self, data):
+        self._buf += data
+
+    def _skip(self, n):
+        del self._buf[:n]
+        self.n_skipped += n
+
+    def next(self):
+        """
+        Next valid frame's payload from the bytes fed so far.
+
+
+        Returns:
+            bytes: Payload, or None until at least self.need more bytes have been fed.
+        """
+        while True:
+            i = self._buf.find(SYNC)
+            if i < 0:
+                # keep a possible partial sync word at the end
+                self._skip(max(len(self._buf) - len(SYNC) + 1, 0))
+                self.need = FRAME_HEADER.itemsize
+                return None
+            if i:
+                self._skip(i)
+            if len(self._buf) < FRAME_HEADER.itemsize:
+                self.need = FRAME_HEADER.itemsize - len(self._buf)
+                return None
+
+            hdr = np.frombuffer(bytes(self._buf[:FRAME_HEADER.itemsize]), dtype=FRAME_HEADER)[0]
+            version, length, seq = int(hdr['version']), int(hdr['length']), int(hdr['seq'])
+            layout = FRAME_LAYOUTS.get(version)
+            if layout is None or LAYOUTS[layout].itemsize != length:
+                self.n_false_syncs += 1
+                self._skip(1)
+                continue
+
+            total = FRAME_HEADER.itemsize + length + CRC_BYTES
+            if len(self._buf) < total:
+                self.need = total - len(self._buf)
+                return None
+            body = bytes(self._buf[len(SYNC):total - CRC_BYTES])
+            crc = int.from_bytes(self._buf[total - CRC_BYTES:total], 'little')
+            if zlib.crc32(body) != crc:
+                self.n_crc_errors += 1
+                self._skip(1)
+                continue
+
+            del self._buf[:total]
+            if self.last_seq is not None:
+                gap = (seq - self.last_seq - 1) % 2**32
+                if gap < 2**31:      # otherwise the counter went back: device restarted
+                    self.n_lost += gap
+            self.last_seq = seq
+            self.last_version = version
+            self.n_frames += 1
+            return body[FRAME_HEADER.itemsize - len(SYNC):]
+
+
+class FrameReader(FrameParser):
+    """
+    Blocking FrameParser over a port, with the read() method of the acquisition packet
+    sources (see acquisition.py).
+
+
+    Parameters:
+        ser: Port or other object with read(n) returning up to n bytes (b'' on timeout).
+        chunk (int): Most bytes taken per read beyond what the current frame needs.
+    """
+
+    def __init__(self, ser, chunk=READ_CHUNK):
+        super().__init__()
+        self.ser = ser
+        self.chunk = int(chunk)
+
+    def read(self, stop_on_error=False):
+        """
+        Next valid frame's payload.
+
+
+        Parameters:
+            stop_on_error (bool): Give up as soon as a frame fails its CRC or header check
+                rather than waiting for another one. In request-response mode nothing else
+                is coming, so the caller can re-trigger at once instead of waiting out the
+                port timeout.
+
+
+        Returns:
+            bytes: Payload, or None if the port timed out first (or a frame was bad).
+        """
+        errors = self.n_crc_errors + self.n_false_syncs
+        while True:
+            payload = self.next()
+            if payload is not None:
+                return payload
+            if stop_on_error and self.n_crc_errors + self.n_false_syncs > errors:
+                return None
+            # never ask for more than is needed or already waiting, or read() would block
+            # for the next packet in request-response mode
+            waiting = getattr(self.ser, 'in_waiting', 0)
+            data = self.ser.read(max(self.need, min(waiting, self.chunk)))
+            if not data:
+                return None
+            self.feed(data)
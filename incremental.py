@@ -0,0 +1,183 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from run_index import RunIndex
+from teensy_archive import CHUNK_SIZE
+from teensy_records import N_SAMPLES, counts_to_volts
+from temperature_bins import DELTA_T, TemperatureBins
+
+
+INDEX_FILE = 'runs.sqlite'          # run_index.RunIndex of every source seen
+STATE_FILE = 'analysis_state.npz'   # accumulators and the last run_id folded into them
+
+# n_runs:   runs added to the accumulators (duplicates by content are skipped)
+# n_fitted: runs with a successful capacitance fit
+# cap_mean, cap_std, cap_min, cap_max: capacitance statistics of the fitted runs (pF)
+# T_mean:   mean temperature of the runs with a valid temperature (°C)
+Summary = namedtuple('Summary', ['n_runs', 'n_fitted', 'cap_mean', 'cap_std', 'cap_min', 'cap_max',
+                                 'T_mean'])
+
+
+class RunningStats:
+    """
+    Count, mean, spread and range of a scalar, updated batch by batch (NaNs ignored).
+
+
+    Batches are merged with the same Chan et al. update as TemperatureBins, so the result
+    equals computing the statistics over all values at once.
+    """
+
+    def __init__(self, count=0, mean=0.0, M2=0.0, lo=np.inf, hi=-np.inf):
+        self.count = int(count)
+        self.mean = float(mean)
+        self.M2 = float(M2)
+        self.min = float(lo)
+        self.max = float(hi)
+
+    def add(self, x):
+        """Fold the finite values of x into the statistics."""
+        x = np.asarray(x, dtype=float)
+        x = x[np.isfinite(x)]
+        if x.size == 0:
+            return
+        n = self.count + x.size
+        mean = x.mean()
+        delta = mean - self.mean
+        self.M2 += ((x - mean)**2).sum() + delta**2 * (self.count * x.size / n)
+        self.mean += delta * (x.size / n)
+        self.count = n
+        self.min = min(self.min, x.min())
+        self.max = max(self.max, x.max())
+
+    @property
+    def std(self):
+        """Population standard deviation (np.nanstd of all values); NaN when empty."""
+        return np.sqrt(self.M2 / self.count) if self.count else np.nan
+
+    def state(self):
+        return np.array([self.count, self.mean, self.M2, self.min, self.max])
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(*state)
+
+
+class IncrementalAnalysis:
+    """
+    Capacitance statistics and temperature-binned curves that only ever process new runs.
+
+
+    State lives in state_dir: a RunIndex (which parses and fits each record once) and the
+    running accumulators, saved with the run_id of the last run folded in. update() indexes
+    the new records of a source and adds only the runs indexed after that run_id to the
+    TemperatureBins and the capacitance / temperature statistics, in place. Capacitance and
+    temperature come from the index, and the samples for the bins from the decode the
+    index does anyway; only runs indexed by an earlier, interrupted update are read again. Calling it after
+    every few new files of a live session therefore costs time proportional to the new
+    data. Runs whose content is already in the index (same checksum) are not counted twice;
+    runs removed from a source stay in the accumulators. Usable as a context manager.
+
+
+    Parameters:
+        state_dir (str): Directory for the index and accumulators (created if needed).
+        R_ohm (float): Discharge resistor (Ω).
+        delta_T (float): Temperature bin width (°C); must match an existing state.
+        table (tuple): Optional pt1000.LOOKUP_TABLES key for the temperature conversion.
+        points_per_decade (int): Log resampling before the capacitance fit (None: every sample).
+    """
+
+    def __init__(self, state_dir, R_ohm, delta_T=DELTA_T, table=None,
+                 points_per_decade=None):
+        os.makedirs(state_dir, exist_ok=True)
+        self.R_ohm = float(R_ohm)
+        self.table = table
+        self.points_per_decade = points_per_decade
+        self.index = RunIndex(os.path.join(state_dir, INDEX_FILE))
+        self.state_path = os.path.join(state_dir, STATE_FILE)
+        if os.path.exists(self.state_path):
+            with np.load(self.state_path) as st:
+                self.bins = TemperatureBins.from_state({k[5:]: st[k] for k in st.files
+                                                        if k.startswith('bins_')})
+                self.caps = RunningStats.from_state(st['caps'])
+                self.temps = RunningStats.from_state(st['temps'])
+                self.n_runs = int(st['n_runs'])
+                self.last_run = int(st['last_run'])
+            if self.bins.delta_T != float(delta_T):
+                raise ValueError(f"{state_dir} bins by {self.bins.delta_T} °C, not {delta_T} °C")
+        else:
+            self.bins = TemperatureBins(N_SAMPLES, delta_T)
+            self.caps, self.temps = RunningStats(), RunningStats()
+            self.n_runs = 0
+            self.last_run = 0
+
+    def save(self):
+        """Write the accumulators (atomically, so an interrupted save keeps the old state)."""
+        tmp = self.state_path[:-len('.npz')] + '.tmp.npz'
+        np.savez(tmp, caps=self.caps.state(), temps=self.temps.state(), n_runs=self.n_runs,
+                 last_run=self.last_run, **{'bins_' + k: v for k, v in self.bins.state().items()})
+        os.replace(tmp, self.state_path)
+
+    def update(self, path, session=None, chunk_size=CHUNK_SIZE, prefix='teensy_raw_', ext='.bin'):
+        """
+        Index the new records of a source and fold every not yet counted run into the totals.
+
+
+        Parameters:
+            path (str): ZIP file, directory or packed log of dual-rate records.
+            session (str): Session label for the index (see RunIndex.update).
+            chunk_size (int): Records decoded per step.
+            prefix (str): Required file-name prefix (ZIP or directory).
+            ext (str): Required file-name extension (ZIP or directory).
+
+
+        Returns:
+            int: Number of runs added to the accumulators.
+        """
+        folded = set()
+
+        def fold_new(run_ids, counts, dts):
+            pos = {run_id: k for k, run_id in enumerate(run_ids)}
+            rows = self.index.select(after=self.last_run, unique=True, run_ids=run_ids)
+            idx = [pos[r.run_id] for r in rows]
+            self._add(rows, counts[idx], dts[idx])
+            folded.update(r.run_id for r in rows)
+
+        self.index.update(path, self.R_ohm, session, self.table, chunk_size,
+                          self.points_per_decade, prefix, ext, on_chunk=fold_new)
+        last = self.index.last_run_id()
+        # runs committed by an interrupted update but never folded in
+        rows = [r for r in self.index.select(after=self.last_run, unique=True) if r.run_id not in folded]
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            self._add(chunk, self.index.load(chunk).counts, np.array([r.dts for r in chunk]))
+        n_added = len(folded) + len(rows)
+        if last > self.last_run:
+            self.n_runs += n_added
+            self.last_run = last
+            self.save()
+        return n_added
+
+    def _add(self, rows, counts, dts):
+        """Fold runs into the accumulators, with their fitted values from the index."""
+        T = np.array([np.nan if r.temperature is None else r.temperature for r in rows])
+        self.bins.add_batch(T, counts_to_volts(counts), dts)
+        self.caps.add([np.nan if r.cap_pf is None else r.cap_pf for r in rows])
+        self.temps.add(T)
+
+    def summary(self):
+        """Summary of every run folded in so far."""
+        return Summary(self.n_runs, self.caps.count, self.caps.mean if self.caps.count else np.nan,
+                       self.caps.std, self.caps.min if self.caps.count else np.nan,
+                       self.caps.max if self.caps.count else np.nan,
+                       self.temps.mean if self.temps.count else np.nan)
+
+    def close(self):
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
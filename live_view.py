@@ -0,0 +1,156 @@
+import itertools
+
+import numpy as np
+
+
+class RingAverage:
+    """
+    Moving average of the last n_runs curves, updated in O(N) per run.
+
+
+    Curves live in a fixed (n_runs, N) ring buffer with a running sum; the sum is recomputed
+    exactly each time the ring wraps so rounding errors cannot build up over a long session.
+
+
+    Parameters:
+        n_runs (int): Window length in runs.
+        n_samples (int): Length N of every curve.
+    """
+
+    def __init__(self, n_runs, n_samples):
+        self.n_runs = int(n_runs)
+        self.buf = np.zeros((self.n_runs, int(n_samples)))
+        self.temps = np.full(self.n_runs, np.nan)
+        self.sum = np.zeros(int(n_samples))
+        self.count = 0
+        self.pos = 0
+
+    def push(self, v, T=np.nan):
+        """
+        Add one curve (and its temperature), replacing the oldest once the window is full.
+
+
+        Returns:
+            ndarray: The moving average after adding v.
+        """
+        if self.count == self.n_runs:
+            self.sum -= self.buf[self.pos]
+        self.buf[self.pos] = v
+        self.sum += self.buf[self.pos]
+        self.temps[self.pos] = np.nan if T is None else T
+        self.pos = (self.pos + 1) % self.n_runs
+        self.count = min(self.count + 1, self.n_runs)
+        if self.pos == 0:
+            self.sum = self.buf.sum(axis=0)
+        return self.mean
+
+    @property
+    def full(self):
+        return self.count == self.n_runs
+
+    @property
+    def mean(self):
+        """Mean curve of the runs in the window."""
+        return self.sum / max(self.count, 1)
+
+    @property
+    def temperature(self):
+        """Mean temperature of the runs in the window; NaN if none is known."""
+        T = self.temps[:self.count] if self.count < self.n_runs else self.temps
+        T = T[np.isfinite(T)]
+        return float(T.mean()) if T.size else np.nan
+
+
+def _legend_handles(legend):
+    # renamed from legendHandles in matplotlib 3.7
+    return getattr(legend, 'legend_handles', None) or legend.legendHandles
+
+
+class LiveLines:
+    """
+    Live decay-curve plot with a fixed set of line artists, redrawn by blitting.
+
+
+    One 'live' line shows the latest moving average; a pool of n_history lines holds the
+    most recent committed curves, reused round-robin with set_data so the number of artists
+    never grows. All of them are animated: after the first full draw only the axes region
+    is restored from a cached background and the lines and legend are redrawn on top, so
+    each update costs the same at the end of a long session as at the start. The axis
+    limits are fixed up front; a full redraw (e.g. after resizing) re-caches the background.
+
+
+    Parameters:
+        ax (Axes): Axes with scales and limits already set.
+        n_history (int): Committed curves kept on screen.
+        live_style (dict): Line properties of the live curve.
+    """
+
+    def __init__(self, ax, n_history=10, live_style=None):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        style = dict(color='k', lw=1.5) if live_style is None else live_style
+        self.live, = ax.plot([], [], animated=True, **style)
+        self.pool = [ax.plot([], [], animated=True)[0] for _ in range(n_history)]
+        self._colors = itertools.cycle([line.get_color() for line in self.pool])
+        self.history = []   # (t, v, label, color), oldest first
+        self.live_label = ''
+        self.legend = ax.legend([self.live] + self.pool, [''] * (n_history + 1),
+                                loc='upper right', fontsize='small')
+        self.legend.set_animated(True)
+        self._background = None
+        self._dirty_history = True
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_artists()
+
+    def _sync_history(self):
+        """Reassign the pool so slot order, colours and legend follow history order."""
+        texts = self.legend.get_texts()
+        handles = _legend_handles(self.legend)
+        for i, line in enumerate(self.pool):
+            used = i < len(self.history)
+            if used:
+                t, v, label, color = self.history[i]
+                line.set_data(t, v)
+                line.set_color(color)
+                handles[i + 1].set_color(color)
+            texts[i + 1].set_text(self.history[i][2] if used else '')
+            line.set_visible(used)
+            handles[i + 1].set_visible(used)
+        self._dirty_history = False
+
+    def _draw_artists(self):
+        if self._dirty_history:
+            self._sync_history()
+        self.legend.get_texts()[0].set_text(self.live_label)
+        _legend_handles(self.legend)[0].set_visible(bool(self.live_label))
+        for line in self.pool:
+            self.ax.draw_artist(line)
+        self.ax.draw_artist(self.live)
+        self.ax.draw_artist(self.legend)
+
+    def update(self, t, v, label):
+        """Show the latest moving average."""
+        self.live.set_data(t, v)
+        self.live_label = label
+
+    def commit(self, t, v, label):
+        """Keep a curve on screen, replacing the oldest once n_history are shown."""
+        if len(self.history) == len(self.pool):
+            color = self.history.pop(0)[3]
+        else:
+            color = next(self._colors)
+        self.history.append((t, np.array(v, copy=True), label, color))
+        self._dirty_history = True
+
+    def redraw(self):
+        """Blit the lines onto the cached background (full draw the first time)."""
+        if self._background is None or not self.canvas.supports_blit:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_artists()
+            self.canvas.blit(self.ax.bbox)
+        self.canvas.flush_events()
@@ -0,0 +1,110 @@
+import functools
+from collections import namedtuple
+
+import numpy as np
+
+from teensy_records import N_SAMPLES, SEGMENT_LENGTHS, TIME_QUANTUM_US, dt_triples, time_axes
+
+
+LOG_POINTS_PER_DECADE = 50   # default log-time resolution of resampled records
+LOG_PLAN_CACHE_SIZE = 64     # distinct (timing, resolution) plans kept by log_plan
+
+# starts:  index of the first sample of every bin, shape (n_bins,)
+# counts:  number of samples in every bin, shape (n_bins,)
+# t_basis: (3, n_bins) so that dts @ t_basis is the mean sample time of every bin (µs)
+# w_basis: (3, n_bins) so that dts @ w_basis is the time every bin covers (µs)
+LogPlan = namedtuple('LogPlan', ['starts', 'counts', 't_basis', 'w_basis'])
+
+# t:      mean sample time per bin (µs), shape (n_bins,) or (n_records, n_bins)
+# V:      mean of the samples in every bin, same shape
+# counts: samples averaged into every bin, shape (n_bins,), shared by all records
+# widths: time covered by every bin (µs), same shape as t; sums to the record duration
+LogResampled = namedtuple('LogResampled', ['t', 'V', 'counts', 'widths'])
+
+
+@functools.lru_cache(maxsize=LOG_PLAN_CACHE_SIZE)
+def _log_plan_for(key, quantum, points_per_decade):
+    """Read-only LogPlan for a quantised (t_high, totalLow1, totalLow) key."""
+    t = time_axes(dt_triples(np.array(key, dtype=float) * quantum))
+    t_min = t[1]
+    bin_id = np.zeros(t.size, dtype=np.int64)          # bin 0 holds the t = 0 sample alone
+    pos = t > 0
+    bin_id[pos] = 1 + np.floor(points_per_decade * np.log10(t[pos] / t_min) + 1e-9).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bin_id[1:] != bin_id[:-1]])
+    counts = np.diff(np.r_[starts, t.size])
+
+    # Sample times are linear in the dt triple, so bin means and widths are too
+    t_basis = np.add.reduceat(time_axes(np.eye(3)), starts, axis=1) / counts
+    w_basis = np.add.reduceat(np.repeat(np.eye(3), SEGMENT_LENGTHS, axis=1), starts, axis=1)
+    plan = LogPlan(starts, counts, t_basis, w_basis)
+    for a in plan:
+        a.setflags(write=False)
+    return plan
+
+
+def log_plan(dts, points_per_decade=LOG_POINTS_PER_DECADE, quantum=TIME_QUANTUM_US):
+    """
+    Shared, lazily built log-time binning of a record with the given dt triple.
+
+
+    Bin 0 is the t = 0 sample; after that bin k collects the samples with
+    t_min * 10**((k - 1) / ppd) <= t < t_min * 10**(k / ppd), where t_min = dt_high is the
+    first nonzero sample time. Bins that would be empty (where samples are sparser than the
+    grid, i.e. the first few µs) are dropped, so every early sample stays its own bin and
+    only the densely sampled later part of the decay is averaged. Plans are cached like
+    teensy_records.time_axis; do not modify the returned arrays.
+
+
+    Parameters:
+        dts (sequence of float): (dt_high, dt_low1, dt_low2) in µs.
+        points_per_decade (int): Bins per decade of time.
+        quantum (float): Rounding of the phase durations for the cache key (µs).
+
+
+    Returns:
+        LogPlan: Bin boundaries as sample indices plus the time coefficients.
+    """
+    key = tuple(int(round(d * n / quantum)) for d, n in zip(dts, SEGMENT_LENGTHS))
+    return _log_plan_for(key, quantum, int(points_per_decade))
+
+
+def log_times(plan, dts):
+    """Mean sample time (µs) of every bin of plan for dt triple(s) dts, shape (..., n_bins)."""
+    return np.asarray(dts, dtype=float) @ plan.t_basis
+
+
+def log_resample(V, dts, points_per_decade=LOG_POINTS_PER_DECADE, plan=None):
+    """
+    Average one record or a stack of records onto a log-time grid.
+
+
+    Each bin is the plain mean of the samples it covers, returned with its mean sample time,
+    its sample count and the time it spans, so the output can go straight into
+    capacitance.fit_capacitance_batch (t, V, weights=counts), TemperatureBins.add_batch
+    (curves of length n_bins) and transform_dielectric_data.get_J_binned (t, V, widths).
+    At 50 points per decade a 16050-sample dual-rate record shrinks to a few hundred bins.
+
+    A stack is binned with a single plan (from the mean dt triple unless one is given) so
+    all rows share counts and can be averaged together; times and widths still follow each
+    record's own dt triple.
+
+
+    Parameters:
+        V (ndarray): Joined [vh, vl] curves, shape (N_SAMPLES,) or (n_records, N_SAMPLES).
+        dts (ndarray): dt triple(s) in µs, shape (3,) or (n_records, 3).
+        points_per_decade (int): Bins per decade of time (ignored when plan is given).
+        plan (LogPlan): Binning to use, e.g. one shared across the chunks of an archive.
+
+
+    Returns:
+        LogResampled: t, V, counts and widths.
+    """
+    V = np.asarray(V, dtype=float)
+    if V.shape[-1] != N_SAMPLES:
+        raise ValueError(f"Expected curves of length {N_SAMPLES}, got shape {V.shape}")
+    dts = np.asarray(dts, dtype=float)
+    if plan is None:
+        ref = dts if dts.ndim == 1 else np.nanmean(dts.reshape(-1, 3), axis=0)
+        plan = log_plan(ref, points_per_decade)
+    V_bins = np.add.reduceat(V, plan.starts, axis=-1) / plan.counts
+    return LogResampled(log_times(plan, dts), V_bins, plan.counts, dts @ plan.w_basis)
@@ -1,10 +1,19 @@
+import queue
 import serial
-import struct
+import sys
 import time
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.optimize import root_scalar
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from acquisition import AcquisitionThread, ConsumerThread, StreamReader, TriggeredReader, drain, put_latest
+from live_view import LiveLines, RingAverage
+from pt1000 import pt1000_temperature  # shared modules at the repo root
+from replay import ReplayReader
+from session_writer import SessionWriter
+from teensy_records import RECORD_BYTES, decode_record, dt_triples, time_axis
+from teensy_sim import SimSerial
 
 # ---- CONFIG ----
 PORT        = 'COM9'
@@ -19,173 +28,178 @@ R_REF       = 1000.0
 S_HIGH      = 50
 S_LOW       = 16000
 
-BYTES_H     = S_HIGH * 2
-BYTES_TH    = 4
-BYTES_L     = S_LOW * 2
-BYTES_TL1   = 4
-BYTES_TL2   = 4
-BYTES_AG    = 4
-
-TOTAL_BYTES = BYTES_H + BYTES_TH + BYTES_L + BYTES_TL1 + BYTES_TL2 + BYTES_AG
+TOTAL_BYTES = RECORD_BYTES  # dual-rate packet, see teensy_records.DUAL_RATE
+TOTAL_SAMPLES = S_HIGH + S_LOW
 
 RAW_DIR = r'C:\Users\klipk\Downloads\test8_logs'
 os.makedirs(RAW_DIR, exist_ok=True)
 
-R0 = 1000.0  # Ohms for Pt1000
-A = 3.9083e-3
-B = -5.775e-7
-C_neg = -4.183e-12  # Only used for T < 0
-
-def pt1000_lookup(R_measured):
-    """
-    Given resistance R in ohms, return the corresponding temperature in °C
-    using the inverse of the Callendar–Van Dusen equation for Pt1000.
-    """
-    def R_of_T(T):
-        C = C_neg if T < 0 else 0.0
-        return R0 * (1 + A*T + B*T**2 + C*(T - 100)*T**3)
-
-    # Define the root function: R(T) - R_measured = 0
-    def residual(T):
-        return R_of_T(T) - R_measured
-
-    # Try solving between -200°C and 850°C (valid for Pt1000)
-    sol = root_scalar(residual, bracket=[-200, 850], method='brentq')
-
-    if sol.converged:
-        return sol.root
-    else:
-        return None  # Or raise an error if desired
-
-def get_teensy_raw(ser):
-    ser.write(b'S')
-    time.sleep(0.05)
-    buf = ser.read(TOTAL_BYTES)
-    return buf if len(buf) == TOTAL_BYTES else None
+# Set to e.g. os.path.join(RAW_DIR, 'session.tlog') to append every run to one packed log
+# (see packed_log.py) instead of writing a teensy_raw_N.bin file per run
+PACKED_LOG = None
+
+# Free-running mode: the Teensy measures and sends continuously (see optimized_tdischarge.txt)
+# instead of waiting for an 'S' per run. STREAM_PERIOD_MS sets the time between measurement
+# starts (0 = back to back); keep it below TIMEOUT.
+STREAM           = True
+STREAM_PERIOD_MS = 0
+
+# Framed packets (sync word, sequence number, CRC32; see framing.py): a corrupted packet
+# costs one record instead of misaligning the stream, and lost packets are reported
+FRAMED           = True
+
+# Talk to a simulated Teensy (teensy_sim.SimSerial) instead of PORT, e.g. to test the
+# pipeline without the board
+SIMULATE         = False
+
+# Replay a recorded ZIP, log directory or packed log through the pipeline instead of
+# acquiring (nothing is saved). REPLAY_SPEED: 1 = real time, 100 = 100x, None = max speed
+REPLAY           = None
+REPLAY_SPEED     = None
+
+# Committed averages waiting to be plotted; older ones are dropped if the plot falls behind
+DISPLAY_QUEUE = 16
 
 def parse_packet(raw):
-    idx = 0
-    vh = np.frombuffer(raw[idx:idx+BYTES_H], dtype=np.uint16)
-    idx += BYTES_H
-    t_high = struct.unpack('<I', raw[idx:idx+BYTES_TH])[0]
-    idx += BYTES_TH
-    vl = np.frombuffer(raw[idx:idx+BYTES_L], dtype=np.uint16)
-    idx += BYTES_L
-    totalLow1 = struct.unpack('<I', raw[idx:idx+BYTES_TL1])[0]
-    idx += BYTES_TL1
-    totalLow = struct.unpack('<I', raw[idx:idx+BYTES_TL2])[0]
-    idx += BYTES_TL2
-    avgTherm = struct.unpack('<f', raw[idx:idx+BYTES_AG])[0]
-    return vh, t_high, vl, totalLow1, totalLow, avgTherm
+    rec = decode_record(raw, 'dual_rate')
+    return (rec['vh'], int(rec['t_high']), rec['vl'],
+            int(rec['totalLow1']), int(rec['totalLow']), float(rec['avgTherm']))
 
 def compute_temperature(avg_count):
     V_th = avg_count / ADC_MAX_10 * V_REF
     R_th = R_REF * V_th / (V_REF - V_th) if V_th != 0 else 0
-    return pt1000_lookup(R_th) if R_th > 0 else None
-
-def next_filename(base="teensy_raw", ext="bin"):
-    i = 1
-    while True:
-        fname = f"{base}_{i}.{ext}"
-        path = os.path.join(RAW_DIR, fname)
-        if not os.path.exists(path):
-            return path, fname
-        i += 1
+    return float(pt1000_temperature(R_th)) if R_th > 0 else None
+
+def save_packet(session):
+    # Persistence consumer: one file (or packed-log record) plus a manifest line per packet
+    def handle(pkt):
+        avgTherm = float(decode_record(pkt.raw, 'dual_rate')['avgTherm'])
+        session.write(pkt.raw, compute_temperature(avgTherm))
+    return handle
+
+def average_runs(live, committed, runs_to_average=10):
+    # Analysis consumer: decode and convert every packet into a ring buffer of the last
+    # runs_to_average runs and hand the moving average (t_all, voltage_avg, temperature_avg,
+    # dts, seq) to the display without blocking: after every run to live, and every
+    # runs_to_average runs to committed as well
+    ring = RingAverage(runs_to_average, TOTAL_SAMPLES)
+
+    def handle(pkt):
+        vh, t_high, vl, totalLow1, totalLow, avgTherm = parse_packet(pkt.raw)
+        T = compute_temperature(avgTherm)
+
+        # Per-sample intervals; the full axis is shared between runs with equal timing
+        dts = dt_triples((t_high, totalLow1, totalLow))
+        t_all = time_axis(dts)
+
+        # Convert ADC counts to voltages WITHOUT normalization
+        v_h = vh * (V_REF / ADC_MAX_10)
+        v_l1 = vl[:1200] * (V_REF / ADC_MAX_12)
+        v_l2 = vl[1200:] * (V_REF / ADC_MAX_12)
+        v_all = np.concatenate((v_h, v_l1, v_l2))
+
+        # Clip to avoid zero or negative values on log scale
+        v_all_clipped = np.clip(v_all, 1e-6, None)
+
+        voltage_avg = ring.push(v_all_clipped, T)
+        update = (t_all, voltage_avg, ring.temperature, dts, pkt.seq)
+        put_latest(live, update)
+        if ring.full and (pkt.seq + 1) % runs_to_average == 0:
+            put_latest(committed, update)
+    return handle
+
+def run_pipeline(reader, session):
+    # The acquisition thread only reads packets; saving and averaging run on their own
+    # threads and the plot on this one, so none of them delay the next run
+    runs_to_average = 10
+    acq = AcquisitionThread(reader)
+    live = queue.Queue(1)
+    committed = queue.Queue(DISPLAY_QUEUE)
+    consumers = [ConsumerThread(acq.subscribe(), average_runs(live, committed, runs_to_average), name='analysis')]
+    if session is not None:
+        consumers.append(ConsumerThread(acq.subscribe(), save_packet(session), name='persistence'))
+    frames = getattr(reader, 'frames', None)
+
+    plt.ion()
+    fig, ax = plt.subplots(figsize=(12, 7))
+    ax.set_xlabel("Time (µs)")
+    ax.set_ylabel("Voltage (V)")
+    ax.set_title("Live Dielectric Decay Curves (Log-Log Scale)")
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlim(10, 1000)
+    ax.set_ylim(0.01, 5)
+    view = LiveLines(ax, n_history=10)   # fixed artists, blitted; see live_view.py
+    plt.show(block=False)
+
+    count = 1
+    n_bad = 0
+    n_lost = 0
+
+    for c in consumers:
+        c.start()
+    acq.start()
+    try:
+        while True:
+            running = acq.is_alive() or any(c.is_alive() for c in consumers)
+            latest = drain(live)
+            for t_all, voltage_avg, temperature_avg, dts, seq in drain(committed):
+                label = f"Avg of {runs_to_average} runs @ {temperature_avg:.1f}°C" if not np.isnan(temperature_avg) else f"Avg of {runs_to_average} runs @ Unknown T"
+                view.commit(np.clip(t_all, 1e-3, None), voltage_avg, label)
+
+                dt_high, dt_low1, dt_low2 = dts
+                print(f"[{count:03d}] Run {seq + 1} | Avg Temp: {temperature_avg if not np.isnan(temperature_avg) else 'N/A'} °C | "
+                      f"HS dt: {dt_high:.2f} us/sample | LS dt1: {dt_low1:.2f} us/sample | LS dt2: {dt_low2:.2f} us/sample | "
+                      f"{acq.rate_per_minute():.1f} runs/min")
+                count += 1
+            if latest:
+                t_all, voltage_avg, temperature_avg, dts, seq = latest[-1]
+                T_text = f"{temperature_avg:.1f}°C" if not np.isnan(temperature_avg) else "Unknown T"
+                view.update(np.clip(t_all, 1e-3, None), voltage_avg,
+                            f"Live: last {min(seq + 1, runs_to_average)} runs @ {T_text}")
+                view.redraw()
+
+            if acq.n_bad > n_bad:
+                print(f"[X] Skipped {acq.n_bad - n_bad} bad packet(s)")
+                n_bad = acq.n_bad
+            if frames is not None and frames.n_lost > n_lost:
+                print(f"[X] {frames.n_lost - n_lost} packet(s) lost (sequence gap before #{frames.last_seq})")
+                n_lost = frames.n_lost
+            if not running or any(c.error is not None for c in consumers):
+                break
+            fig.canvas.start_event_loop(0.1)  # keeps the window responsive without a full redraw
+    finally:
+        acq.stop()
+        acq.join(TIMEOUT + 1)
+        for c in consumers:
+            c.join()
+        if session is not None:
+            session.close()
+        for c in consumers:
+            if c.error is not None:
+                print(f"[X] {c.name} consumer failed: {c.error!r}")
+    print(f"=== {acq.n_packets} runs at {acq.rate_per_minute():.1f} runs/min ===")
 
 def loop_log_raw_data():
+    if REPLAY is not None:
+        print(f"=== Replaying {REPLAY} ({'max speed' if not REPLAY_SPEED else f'{REPLAY_SPEED}x'}); Ctrl+C to stop ===")
+        run_pipeline(ReplayReader(REPLAY, speed=REPLAY_SPEED), None)
+        return
+
     print("=== Logging loop started; Ctrl+C to stop ===")
-    with serial.Serial(PORT, BAUDRATE, timeout=TIMEOUT) as ser:
+    session = SessionWriter(RAW_DIR, packed_log=PACKED_LOG)  # scans RAW_DIR once; writes manifest.csv
+    port = SimSerial(timeout=TIMEOUT) if SIMULATE else serial.Serial(PORT, BAUDRATE, timeout=TIMEOUT)
+    with port as ser:
         ser.setDTR(False)
+        ser.write(b'X')   # stop a stream left running by an earlier session
         time.sleep(1)
         ser.reset_input_buffer()
 
-        plt.ion()
-        fig, ax = plt.subplots(figsize=(12, 7))
-        ax.set_xlabel("Time (µs)")
-        ax.set_ylabel("Voltage (V)")
-        ax.set_title("Live Dielectric Decay Curves (Log-Log Scale)")
-
-        count = 1
-        lines = []   # List to keep plotted lines
-        labels = []  # Corresponding labels
-
-        runs_to_average = 10
-        voltage_accum = None
-        temperature_accum = []
-        run_buffer = 0
-
-        while True:
-            raw = get_teensy_raw(ser)
-            if raw:
-                path, fname = next_filename()
-                with open(path, 'wb') as f:
-                    f.write(raw)
-
-                vh, t_high, vl, totalLow1, totalLow, avgTherm = parse_packet(raw)
-                T = compute_temperature(avgTherm)
-
-                # Calculate per-sample time intervals
-                dt_high = t_high / S_HIGH
-                dt_low1 = totalLow1 / 1200          # First 1200 low-speed samples
-                dt_low2 = (totalLow) / (S_LOW - 1200)  # Remaining samples
-
-                # Build time axes
-                t_h = np.arange(S_HIGH) * dt_high
-                t_l1 = t_h[-1] + dt_high + np.arange(1200) * dt_low1
-                t_l2 = t_l1[-1] + dt_low1 + np.arange(S_LOW - 1200) * dt_low2
-                t_all = np.concatenate((t_h, t_l1, t_l2))
-
-                # Convert ADC counts to voltages WITHOUT normalization
-                v_h = vh * (V_REF / ADC_MAX_10)
-                v_l1 = vl[:1200] * (V_REF / ADC_MAX_12)
-                v_l2 = vl[1200:] * (V_REF / ADC_MAX_12)
-                v_all = np.concatenate((v_h, v_l1, v_l2))
-
-                # Clip to avoid zero or negative values on log scale
-                t_all_clipped = np.clip(t_all, 1e-3, None)
-                v_all_clipped = np.clip(v_all, 1e-6, None)
-
-                # Accumulate for averaging
-                if voltage_accum is None:
-                    voltage_accum = np.zeros_like(v_all_clipped)
-                voltage_accum += v_all_clipped
-                temperature_accum.append(T if T else np.nan)
-                run_buffer += 1
-
-                if run_buffer == runs_to_average:
-                    voltage_avg = voltage_accum / runs_to_average
-                    temperature_avg = np.nanmean(temperature_accum)
-
-                    label = f"Avg of {runs_to_average} runs @ {temperature_avg:.1f}°C" if not np.isnan(temperature_avg) else f"Avg of {runs_to_average} runs @ Unknown T"
-                    line, = ax.plot(t_all_clipped, voltage_avg, label=label)
-
-                    lines.append(line)
-                    labels.append(label)
-
-                    if len(lines) > 10:
-                        labels.pop(0)
-                        lines.pop(0)
-
-                    ax.legend(lines, labels, loc='upper right', fontsize='small')
-                    ax.set_xscale('log')
-                    ax.set_yscale('log')
-                    plt.xlim(10, 1000)
-                    plt.ylim(0.01, 5)
-                    plt.draw()
-                    plt.pause(0.1)
-
-                    print(f"[{count:03d}] Saved {fname} | Avg Temp: {temperature_avg if not np.isnan(temperature_avg) else 'N/A'} °C | "
-                          f"HS dt: {dt_high:.2f} us/sample | LS dt1: {dt_low1:.2f} us/sample | LS dt2: {dt_low2:.2f} us/sample")
-
-                    count += 1
-                    voltage_accum = None
-                    temperature_accum = []
-                    run_buffer = 0
-
-            else:
-                print("[X] Skipped bad packet")
-
-            time.sleep(0.5)
+        if STREAM:
+            reader = StreamReader(ser, TOTAL_BYTES, period_ms=STREAM_PERIOD_MS, framed=FRAMED)
+        else:
+            reader = TriggeredReader(ser, TOTAL_BYTES, framed=FRAMED)
+        run_pipeline(reader, session)
 
 if __name__ == '__main__':
     try:
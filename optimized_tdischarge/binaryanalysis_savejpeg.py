@@ -1,8 +1,12 @@
 import os
-import struct
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from plot_lod import DecimatedLines
+from teensy_records import RECORD_BYTES, decode_record
+
 # ---- CONFIG ----
 FILE_PATH = r'C:\Users\klipk\Downloads\test7_logs\teensy_raw_5.bin'
 
@@ -13,14 +17,7 @@ R_REF   = 1000.0  # Ω
 S_HIGH  = 50       # Update to your actual S_HIGH
 S_LOW   = 16000    # Your S_LOW
 
-BYTES_H = S_HIGH * 2
-BYTES_TH = 4
-BYTES_L = S_LOW * 2
-BYTES_TL1 = 4
-BYTES_TL2 = 4
-BYTES_AG = 4       # float32 thermistor avg at end
-
-TOTAL = BYTES_H + BYTES_TH + BYTES_L + BYTES_TL1 + BYTES_TL2 + BYTES_AG
+TOTAL = RECORD_BYTES  # dual-rate packet, see teensy_records.DUAL_RATE
 
 def pt1000_lookup(R):
     T_ref = np.array([-79, -70, -60, -50, -40, -30,
@@ -38,28 +35,17 @@ with open(FILE_PATH, 'rb') as f:
 if len(raw) != TOTAL:
     raise ValueError(f"Expected {TOTAL} bytes, got {len(raw)}")
 
-idx = 0
-vh = np.frombuffer(raw[idx:idx+BYTES_H], dtype=np.uint16)
-idx += BYTES_H
-
-t_high = struct.unpack('<I', raw[idx:idx+BYTES_TH])[0]
-idx += BYTES_TH
-
-vl = np.frombuffer(raw[idx:idx+BYTES_L], dtype=np.uint16)
-idx += BYTES_L
-
-totalLow1 = struct.unpack('<I', raw[idx:idx+BYTES_TL1])[0]
-idx += BYTES_TL1
-
-totalLow2 = struct.unpack('<I', raw[idx:idx+BYTES_TL2])[0]
-idx += BYTES_TL2
-
-avg_ct = struct.unpack('<f', raw[idx:idx+BYTES_AG])[0]
+rec = decode_record(raw, 'dual_rate')
+vh, vl = rec['vh'], rec['vl']
+t_high = int(rec['t_high'])
+totalLow1 = int(rec['totalLow1'])
+totalLow2 = int(rec['totalLow'])
+avg_ct = float(rec['avgTherm'])
 
 # Calculate time axes:
 dt_high = t_high / S_HIGH
 dt_low1 = totalLow1 / 1200.0         # first 1200 low-speed samples
-dt_low2 = (totalLow2 - totalLow1) / (S_LOW - 1200.0)  # remaining samples
+dt_low2 = totalLow2 / (S_LOW - 1200.0)  # remaining samples (firmware times phase 2 alone)
 
 th_ax = np.arange(S_HIGH) * dt_high
 tl_ax1 = th_ax[-1] + dt_high + np.arange(1200) * dt_low1
@@ -98,12 +84,12 @@ print(f"Temperature: {T_deg:.2f} °C")
 
 
 plt.figure(figsize=(10, 6))
-plt.plot(th_ax, v_high, label="High-speed")
-plt.plot(tl_ax1, v_low1, label="Low-speed part 1")
-plt.plot(tl_ax2, v_low2, label="Low-speed part 2")
+plt.xscale('linear')
+# Min/max envelopes at screen resolution, recomputed on zoom (see plot_lod.py)
+segments = DecimatedLines(plt.gca(), [(th_ax, v_high), (tl_ax1, v_low1), (tl_ax2, v_low2)],
+                          labels=["High-speed", "Low-speed part 1", "Low-speed part 2"])
 plt.xlabel("Time (µs)")
 plt.ylabel("Voltage (V)")
-plt.xscale('linear')
 plt.xlim(0, 50)
 plt.ylim(0.01, 5)
 plt.yscale('log')
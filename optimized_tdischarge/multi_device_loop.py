@@ -0,0 +1,53 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from acquisition_service import AcquisitionService  # shared modules at the repo root
+from pt1000 import thermistor_temperature
+from teensy_records import decode_record
+
+# ---- CONFIG ----
+# One entry per Teensy: device id -> port. Each device streams to RAW_DIR/<device id>.tlog
+DEVICES = {
+    'sample':    'COM9',
+    'reference': 'COM10',
+}
+BAUDRATE         = 115200
+STREAM_PERIOD_MS = 0       # time between measurement starts on every device (0 = back to back)
+REPORT_EVERY_S   = 10
+
+RAW_DIR = r'C:\Users\klipk\Downloads\multi_logs'
+
+def print_record(rec):
+    if rec.seq % 10 == 0:
+        T = float(thermistor_temperature(decode_record(rec.raw, 'dual_rate')['avgTherm']))
+        print(f"[{rec.device_id}] record {rec.seq} @ {T:.2f} °C")
+
+async def report(service):
+    while True:
+        await asyncio.sleep(REPORT_EVERY_S)
+        total = 0.0
+        for device_id, stats in service.stats.items():
+            rate = stats.rate_per_minute()
+            total += rate
+            status = f"error: {stats.error!r}" if stats.error is not None else "ok"
+            print(f"    {device_id:>10}: {stats.n_records} records, {rate:.1f}/min, "
+                  f"{stats.n_lost} lost, {stats.n_crc_errors} CRC errors ({status})")
+        print(f"    {'total':>10}: {total:.1f} records/min")
+
+async def main():
+    service = AcquisitionService(DEVICES, RAW_DIR, baudrate=BAUDRATE, period_ms=STREAM_PERIOD_MS,
+                                 on_record=print_record)
+    reporter = asyncio.create_task(report(service))
+    try:
+        await service.run()
+    finally:
+        reporter.cancel()
+
+if __name__ == '__main__':
+    print(f"=== Streaming from {len(DEVICES)} devices; Ctrl+C to stop ===")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n=== Logging stopped by user ===")
@@ -1,9 +1,13 @@
+import os
 import serial
-import struct
+import sys
 import time
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.optimize import root_scalar
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pt1000 import pt1000_temperature  # shared modules at the repo root
+from teensy_records import RECORD_BYTES, decode_record
 
 # ---- CONFIG ----
 PORT        = 'COM9'
@@ -19,40 +23,8 @@ S_HIGH      = 50
 S_LOW1 = 1200
 S_LOW       = 16000
 
-BYTES_H     = S_HIGH * 2
-BYTES_TH    = 4
-BYTES_L     = S_LOW * 2
-BYTES_TL1   = 4  # totalLow1
-BYTES_TL2   = 4  # totalLow2 (totalLow)
-BYTES_AG    = 4  # avgTherm (float32)
-
-TOTAL_BYTES = BYTES_H + BYTES_TH + BYTES_L + BYTES_TL1 + BYTES_TL2 + BYTES_AG
-
-R0 = 1000.0  # Ohms for Pt1000
-A = 3.9083e-3
-B = -5.775e-7
-C_neg = -4.183e-12  # Only used for T < 0
-
-def pt1000_lookup(R_measured):
-    """
-    Given resistance R in ohms, return the corresponding temperature in °C
-    using the inverse of the Callendar–Van Dusen equation for Pt1000.
-    """
-    def R_of_T(T):
-        C = C_neg if T < 0 else 0.0
-        return R0 * (1 + A*T + B*T**2 + C*(T - 100)*T**3)
-
-    # Define the root function: R(T) - R_measured = 0
-    def residual(T):
-        return R_of_T(T) - R_measured
-
-    # Try solving between -200°C and 850°C (valid for Pt1000)
-    sol = root_scalar(residual, bracket=[-200, 850], method='brentq')
-
-    if sol.converged:
-        return sol.root
-    else:
-        return None  # Or raise an error if desired
+TOTAL_BYTES = RECORD_BYTES  # dual-rate packet, see teensy_records.DUAL_RATE
+
     
 def get_teensy_data():
     with serial.Serial(PORT, BAUDRATE, timeout=TIMEOUT) as ser:
@@ -66,18 +38,10 @@ def get_teensy_data():
         if len(raw) != TOTAL_BYTES:
             raise RuntimeError(f"Expected {TOTAL_BYTES} bytes, got {len(raw)}")
 
-    idx = 0
-    vh = np.frombuffer(raw[idx:idx+BYTES_H], dtype=np.uint16)
-    idx += BYTES_H
-    t_high = struct.unpack('<I', raw[idx:idx+BYTES_TH])[0]
-    idx += BYTES_TH
-    vl = np.frombuffer(raw[idx:idx+BYTES_L], dtype=np.uint16)
-    idx += BYTES_L
-    totalLow1 = struct.unpack('<I', raw[idx:idx+BYTES_TL1])[0]
-    idx += BYTES_TL1
-    totalLow = struct.unpack('<I', raw[idx:idx+BYTES_TL2])[0]
-    idx += BYTES_TL2
-    avg_count = struct.unpack('<f', raw[idx:idx+BYTES_AG])[0]
+    rec = decode_record(raw, 'dual_rate')
+    vh, vl = rec['vh'], rec['vl']
+    t_high, totalLow1, totalLow = int(rec['t_high']), int(rec['totalLow1']), int(rec['totalLow'])
+    avg_count = float(rec['avgTherm'])
 
     return vh, t_high, vl, totalLow1, totalLow, avg_count
 
@@ -92,7 +56,7 @@ if __name__ == "__main__":
     dt_l1 = totalLow1 / S_LOW1
 
     # Phase 2: remaining samples
-    dt_l2 = (totalLow - totalLow1) / (S_LOW - 1200)
+    dt_l2 = totalLow / (S_LOW - 1200)  # firmware restarts its timer for phase 2
 
     # Build time arrays (microseconds)
     t_h = np.arange(S_HIGH) * dt_h + dt_h
@@ -114,7 +78,7 @@ if __name__ == "__main__":
     # Calculate temperature from thermistor voltage
     V_th = avg_count / ADC_MAX_10 * V_REF
     R_th = R_REF * V_th / (V_REF - V_th)
-    T_C = pt1000_lookup(R_th)
+    T_C = pt1000_temperature(R_th)
 
     # Function to calculate capacitance from RC decay fit
     def calculate_capacitance(t_us, v, R_ohm):
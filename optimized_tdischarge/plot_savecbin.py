@@ -1,12 +1,15 @@
 # 4) get_teensy_data() + plotting
 import serial
-import struct
+import sys
 import time
 import os
 
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from teensy_records import JULY_29, decode_record
+
 # ---- CONFIG ----
 PORT        = 'COM9'
 BAUDRATE    = 115200
@@ -18,12 +21,7 @@ R_REF       = 1000.0
 
 S_HIGH      = 1000
 S_LOW       = 16000
-BYTES_H     = S_HIGH * 2
-BYTES_TH    = 4
-BYTES_L     = S_LOW  * 2
-BYTES_TL    = 4
-BYTES_AG    = 4               # float32
-TOTAL_BYTES = BYTES_H + BYTES_TH + BYTES_L + BYTES_TL + BYTES_AG
+TOTAL_BYTES = JULY_29.itemsize   # 1000 high-speed samples, see teensy_records.JULY_29
 
 RAW_DIR = r'C:\Users\klipk\Downloads\teensy_raw'
 os.makedirs(RAW_DIR, exist_ok=True)
@@ -54,12 +52,11 @@ def get_teensy_data():
         f.write(raw)
     print(f"[OK] Raw data saved to {fname}")
 
-    idx       = 0
-    vh        = np.frombuffer(raw[idx:idx+BYTES_H],   dtype=np.uint16); idx += BYTES_H
-    t_high    = struct.unpack('<I',  raw[idx:idx+BYTES_TH])[0];       idx += BYTES_TH
-    vl        = np.frombuffer(raw[idx:idx+BYTES_L],   dtype=np.uint16); idx += BYTES_L
-    t_low     = struct.unpack('<I',  raw[idx:idx+BYTES_TL])[0];       idx += BYTES_TL
-    avg_count = struct.unpack('<f',  raw[idx:idx+BYTES_AG])[0]        # float32
+    rec       = decode_record(raw, 'july_29')
+    vh, vl    = rec['vh'], rec['vl']
+    t_high    = int(rec['t_high'])
+    t_low     = int(rec['t_low'])
+    avg_count = float(rec['avgTherm'])
 
     return vh, t_high, vl, t_low, avg_count
 
@@ -0,0 +1,182 @@
+import os
+
+import numpy as np
+
+from teensy_archive import list_records, read_raw
+from teensy_records import LAYOUTS, RECORD_BYTES
+
+
+# A packed log is one HEADER followed by fixed-size raw records back to back, so record k
+# lives at HEADER.itemsize + k * record_bytes and the whole file maps as a structured array.
+MAGIC = b'TNSYLOG1'
+LOG_VERSION = 1
+PACKED_EXT = '.tlog'
+
+HEADER = np.dtype([
+    ('magic',        'S8'),
+    ('version',      '<u2'),
+    ('record_bytes', '<u4'),
+    ('layout',       'S32'),    # key into teensy_records.LAYOUTS
+    ('reserved',     'V18'),
+])                              # 64 bytes
+
+
+def read_header(path):
+    """
+    Read and validate the header of a packed log.
+
+
+    Parameters:
+        path (str): Packed log file.
+
+
+    Returns:
+        tuple: (layout, record_bytes).
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER.itemsize)
+    if len(raw) != HEADER.itemsize:
+        raise ValueError(f"{path}: too short for a packed log header")
+    hdr = np.frombuffer(raw, dtype=HEADER)[0]
+    if hdr['magic'] != MAGIC:
+        raise ValueError(f"{path}: not a packed Teensy log (magic {hdr['magic']!r})")
+    if hdr['version'] != LOG_VERSION:
+        raise ValueError(f"{path}: unsupported packed log version {hdr['version']}")
+    layout = hdr['layout'].decode('ascii')
+    if LAYOUTS[layout].itemsize != hdr['record_bytes']:
+        raise ValueError(f"{path}: record size {hdr['record_bytes']} does not match layout {layout}")
+    return layout, int(hdr['record_bytes'])
+
+
+def open_packed_log(path):
+    """
+    Memory-map a packed log as a read-only structured array of records (zero-copy).
+
+
+    A trailing partial record (e.g. from an interrupted write) is ignored.
+
+
+    Parameters:
+        path (str): Packed log file.
+
+
+    Returns:
+        ndarray: np.memmap of shape (n_records,) with the dtype of the log's layout.
+    """
+    layout, record_bytes = read_header(path)
+    n = (os.path.getsize(path) - HEADER.itemsize) // record_bytes
+    if n == 0:
+        return np.empty(0, dtype=LAYOUTS[layout])
+    return np.memmap(path, dtype=LAYOUTS[layout], mode='r', offset=HEADER.itemsize, shape=(n,))
+
+
+class PackedLogWriter:
+    """
+    Append raw records to a packed log, creating it with a header if it does not exist.
+
+
+    Usable as a context manager. Reopening an existing log continues after its last whole
+    record; a partial record left by a crash is truncated away.
+
+
+    Parameters:
+        path (str): Packed log file.
+        layout (str): Key into teensy_records.LAYOUTS; must match an existing log's header.
+        flush_every (int): Flush to disk after this many appended records.
+    """
+
+    def __init__(self, path, layout='dual_rate', flush_every=1):
+        self.path = path
+        self.layout = layout
+        self.record_bytes = LAYOUTS[layout].itemsize
+        self.flush_every = int(flush_every)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            existing, _ = read_header(path)
+            if existing != layout:
+                raise ValueError(f"{path} holds {existing} records, not {layout}")
+            self.count = (os.path.getsize(path) - HEADER.itemsize) // self.record_bytes
+            self._f = open(path, 'r+b')
+            self._f.truncate(HEADER.itemsize + self.count * self.record_bytes)
+            self._f.seek(0, os.SEEK_END)
+        else:
+            hdr = np.zeros(1, dtype=HEADER)
+            hdr['magic'] = MAGIC
+            hdr['version'] = LOG_VERSION
+            hdr['record_bytes'] = self.record_bytes
+            hdr['layout'] = layout.encode('ascii')
+            self.count = 0
+            self._f = open(path, 'wb')
+            self._f.write(hdr.tobytes())
+
+    def append(self, raw):
+        """
+        Append one raw record.
+
+
+        Parameters:
+            raw (bytes-like): Exactly record_bytes bytes.
+
+
+        Returns:
+            int: Index of the record in the log.
+        """
+        if len(raw) != self.record_bytes:
+            raise ValueError(f"Bad record size {len(raw)} (expected {self.record_bytes})")
+        self._f.write(raw)
+        index = self.count
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self._f.flush()
+        return index
+
+    def extend(self, buf):
+        """
+        Append several back-to-back raw records in one write.
+
+
+        Parameters:
+            buf (bytes-like): A whole number of records.
+
+
+        Returns:
+            int: Index of the first appended record.
+        """
+        if len(buf) % self.record_bytes:
+            raise ValueError(f"Buffer of {len(buf)} bytes is not a whole number of records")
+        self._f.write(buf)
+        index = self.count
+        self.count += len(buf) // self.record_bytes
+        self._f.flush()
+        return index
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pack_archive(archive_path, log_path, chunk_size=128, prefix='teensy_raw_', ext='.bin'):
+    """
+    Convert a ZIP archive or directory of teensy_raw_N.bin files into one packed log.
+
+
+    Parameters:
+        archive_path (str): ZIP file or directory of dual-rate records.
+        log_path (str): Packed log to create or extend.
+        chunk_size (int): Records read per step.
+        prefix (str): Required file-name prefix.
+        ext (str): Required file-name extension.
+
+
+    Returns:
+        list: Names of the records written, in log order.
+    """
+    names = [n for n, size in list_records(archive_path, prefix, ext) if size == RECORD_BYTES]
+    with PackedLogWriter(log_path, 'dual_rate', flush_every=chunk_size) as log:
+        for i in range(0, len(names), chunk_size):
+            log.extend(read_raw(archive_path, names[i:i + chunk_size]))
+    return names
@@ -0,0 +1,112 @@
+import numpy as np
+
+
+LOD_BINS_PER_PIXEL = 1.0    # envelope bins per horizontal pixel of the axes
+
+
+def minmax_envelope(x, Y, xlim, n_bins, log=True):
+    """
+    Reduce curves to a min/max envelope of the samples visible in xlim.
+
+
+    The visible range is split into n_bins bins (log-spaced when log=True, matching a log
+    time axis) and each non-empty bin is replaced by two points at its first and last
+    sample time carrying the bin's extreme values, ordered so a rising or falling segment
+    keeps its direction. Drawn at one bin per pixel this looks the same as the full curve:
+    every sample's value stays inside the drawn vertical extent of its pixel column. One
+    sample on each side of the range is kept so lines run to the axes edges.
+
+
+    Parameters:
+        x (ndarray): Increasing sample times, shape (N,).
+        Y (ndarray): Curve(s) sampled at x, shape (N,) or (n_curves, N).
+        xlim (tuple): Visible (x_min, x_max).
+        n_bins (int): Number of bins across the visible range.
+        log (bool): Log-spaced bins; samples at x <= 0 are dropped.
+
+
+    Returns:
+        tuple: (x_d, Y_d) with the shape of x and Y reduced to at most 2 * n_bins + 2 samples.
+    """
+    x = np.asarray(x, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    lo, hi = sorted(xlim)
+    if log:
+        first_pos = np.searchsorted(x, 0.0, side='right')
+        x, Y = x[first_pos:], Y[..., first_pos:]
+        if x.size == 0:
+            return x, Y
+        lo = max(lo, x[0])
+    i0 = max(np.searchsorted(x, lo, side='left') - 1, 0)
+    i1 = min(np.searchsorted(x, hi, side='right') + 1, x.size)
+    x, Y = x[i0:i1], Y[..., i0:i1]
+    n_bins = max(int(n_bins), 1)
+    if x.size <= 2 * n_bins + 2:
+        return x, Y
+
+    if log:
+        lo, hi = max(lo, x[0]), max(hi, lo)
+        edges = np.geomspace(lo, hi, n_bins + 1) if hi > lo else np.array([lo, hi])
+    else:
+        edges = np.linspace(lo, hi, n_bins + 1)
+    bin_id = np.searchsorted(edges, x, side='right')     # 0 and n_bins + 1 are outside xlim
+    starts = np.flatnonzero(np.r_[True, bin_id[1:] != bin_id[:-1]])
+    ends = np.r_[starts[1:], x.size] - 1
+
+    y_min = np.minimum.reduceat(Y, starts, axis=-1)
+    y_max = np.maximum.reduceat(Y, starts, axis=-1)
+    falling = Y[..., starts] >= Y[..., ends]
+    x_d = np.empty(2 * starts.size)
+    x_d[0::2], x_d[1::2] = x[starts], x[ends]
+    Y_d = np.empty(Y.shape[:-1] + (2 * starts.size,))
+    Y_d[..., 0::2] = np.where(falling, y_max, y_min)
+    Y_d[..., 1::2] = np.where(falling, y_min, y_max)
+    return x_d, Y_d
+
+
+class DecimatedLines:
+    """
+    Plot many long curves as pixel-resolution min/max envelopes that follow zoom and resize.
+
+
+    Only the envelope of what is visible is handed to matplotlib (see minmax_envelope), so
+    a cooldown's worth of 16050-point bin curves draws with a few hundred points each. The
+    envelopes are recomputed whenever the x limits or the figure size change; the full
+    curves are kept here, so zooming in recovers every sample.
+
+
+    Parameters:
+        ax (Axes): Target axes; set the x scale before creating the lines.
+        curves (sequence): (x, y) pairs, x increasing.
+        labels (sequence of str): Optional legend label per curve.
+        bins_per_pixel (float): Envelope resolution.
+        **line_kw: Passed to ax.plot for every curve.
+    """
+
+    def __init__(self, ax, curves, labels=None, bins_per_pixel=LOD_BINS_PER_PIXEL, **line_kw):
+        self.ax = ax
+        self.curves = [(np.asarray(x, dtype=float).ravel(), np.asarray(y, dtype=float).ravel())
+                       for x, y in curves]
+        self.bins_per_pixel = float(bins_per_pixel)
+        labels = [None] * len(self.curves) if labels is None else labels
+        self.lines = [ax.plot([], [], label=label, **line_kw)[0] for label in labels]
+
+        # the first envelope spans all the data so autoscaling sees the full extent
+        log = ax.get_xscale() == 'log'
+        xs = [x[x > 0] if log else x for x, _ in self.curves]
+        xs = [x for x in xs if x.size]
+        if xs:
+            self.refresh((min(x[0] for x in xs), max(x[-1] for x in xs)))
+            ax.relim()
+            ax.autoscale_view()
+        ax.callbacks.connect('xlim_changed', lambda ax: self.refresh())
+        ax.figure.canvas.mpl_connect('resize_event', lambda event: self.refresh())
+
+    def refresh(self, xlim=None):
+        """Recompute every envelope for xlim (default: the current view)."""
+        xlim = self.ax.get_xlim() if xlim is None else xlim
+        n_bins = int(self.ax.bbox.width * self.bins_per_pixel)
+        log = self.ax.get_xscale() == 'log'
+        for line, (x, y) in zip(self.lines, self.curves):
+            line.set_data(*minmax_envelope(x, y, xlim, n_bins, log))
+        self.ax.figure.canvas.draw_idle()
@@ -0,0 +1,112 @@
+import numpy as np
+
+
+# Callendar–Van Dusen coefficients for a Pt1000 (IEC 60751)
+R0 = 1000.0       # Ohms at 0 °C
+A = 3.9083e-3
+B = -5.775e-7
+C_neg = -4.183e-12  # Only used for T < 0
+
+# Thermistor divider on the Teensy (10-bit ADC1, reference resistor on top)
+V_REF = 3.3
+ADC_MAX_10 = 1023.0
+R_REF = 1000.0
+
+NEWTON_ITERS = 6  # Quadratic start is within ~0.1 °C above -200 °C; 6 steps reach machine precision
+
+# Interpolation tables hard-coded by the various scripts, keyed by (T_min, T_max) in °C
+LOOKUP_TABLES = {
+    (-90, 30): (
+        [-90, -80, -70, -60, -50, -40, -30, -20, -10, 0, 10, 20, 30],
+        [643.00, 683.25, 723.30, 763.30, 803.10, 842.70, 882.20, 921.60,
+         960.90, 1000.00, 1039.00, 1077.90, 1116.70],
+    ),
+    (-79, 30): (
+        [-79, -70, -60, -50, -40, -30, -20, -10, 0, 10, 20, 30],
+        [687.30, 723.30, 763.30, 803.10, 842.70, 882.20, 921.60, 960.90,
+         1000.00, 1039.00, 1077.90, 1116.70],
+    ),
+    (-79, 100): (
+        [-79, -70, -60, -50, -40, -30, -20, -10, 0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100],
+        [687.30, 723.30, 763.30, 803.10, 842.70, 882.20, 921.60,
+         960.90, 1000.00, 1039.00, 1077.90, 1116.70, 1155.40, 1193.60,
+         1232.40, 1271.00, 1309.50, 1347.80, 1385.90],
+    ),
+}
+
+
+def pt1000_resistance(T):
+    """
+    Callendar–Van Dusen resistance of a Pt1000 at temperature T.
+
+
+    Parameters:
+        T (float or ndarray): Temperature (°C).
+
+
+    Returns:
+        float or ndarray: Resistance (Ω).
+    """
+    T = np.asarray(T, dtype=float)
+    C = np.where(T < 0, C_neg, 0.0)
+    return R0 * (1 + A * T + B * T**2 + C * (T - 100) * T**3)
+
+
+def pt1000_temperature(R, table=None):
+    """
+    Invert the Callendar–Van Dusen equation for an array of Pt1000 resistances.
+
+
+    For R >= R0 (T >= 0 °C) the equation is quadratic and solved in closed form. Below 0 °C
+    the quadratic root is refined with a fixed number of vectorised Newton steps on the
+    full quartic. Passing a key of LOOKUP_TABLES instead reproduces the linear interpolation
+    used by the older scripts.
+
+
+    Parameters:
+        R (float or ndarray): Resistance (Ω).
+        table (tuple): Optional (T_min, T_max) key of LOOKUP_TABLES to interpolate instead.
+
+
+    Returns:
+        float or ndarray: Temperature (°C); NaN where R is not finite or not positive.
+    """
+    R = np.asarray(R, dtype=float)
+    if table is not None:
+        T_ref, R_ref = LOOKUP_TABLES[table]
+        return np.interp(R, R_ref, T_ref)
+
+    with np.errstate(invalid='ignore'):
+        T = (-A + np.sqrt(A**2 - 4 * B * (1 - R / R0))) / (2 * B)
+        neg = R < R0
+        if np.any(neg):
+            Tn = T[neg] if T.ndim else T
+            Rn = R[neg] if R.ndim else R
+            for _ in range(NEWTON_ITERS):
+                f = R0 * (1 + A * Tn + B * Tn**2 + C_neg * (Tn - 100) * Tn**3) - Rn
+                df = R0 * (A + 2 * B * Tn + C_neg * (4 * Tn**3 - 300 * Tn**2))
+                Tn = Tn - f / df
+            if T.ndim:
+                T[neg] = Tn
+            else:
+                T = Tn
+    return np.where(R > 0, T, np.nan)[()]
+
+
+def thermistor_temperature(avg_count, table=None):
+    """
+    Convert averaged thermistor ADC counts from the Teensy into temperature.
+
+
+    Parameters:
+        avg_count (float or ndarray): Averaged 10-bit ADC1 reading(s).
+        table (tuple): Optional LOOKUP_TABLES key, as for pt1000_temperature.
+
+
+    Returns:
+        float or ndarray: Temperature (°C); NaN where the divider voltage is out of range.
+    """
+    V_th = np.asarray(avg_count, dtype=float) / ADC_MAX_10 * V_REF
+    with np.errstate(divide='ignore', invalid='ignore'):
+        R_th = np.where((V_th > 0) & (V_th < V_REF), R_REF * V_th / (V_REF - V_th), np.nan)
+    return pt1000_temperature(R_th, table)
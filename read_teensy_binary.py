@@ -1,13 +1,14 @@
-import struct
 import os
 import numpy as np
 
+from teensy_records import LEGACY_8192, decode_record
+
 
 N_SAMPLES   = 8192
 BYTES_PER_ADC_ARRAY = N_SAMPLES * 2
 BYTES_TIME  = 4
 BYTES_ADC   = BYTES_PER_ADC_ARRAY * 2
-TOTAL_BYTES = BYTES_ADC + BYTES_TIME
+TOTAL_BYTES = LEGACY_8192.itemsize   # BYTES_ADC + BYTES_TIME
 
 
 def pt1000_lookup(R):
@@ -44,14 +45,10 @@ def get_teensy_binary_data(fp):
     raw = fp.read()
 
 
-    cap_adc_data    = raw[:BYTES_PER_ADC_ARRAY]
-    therm_adc_data  = raw[BYTES_PER_ADC_ARRAY:2 * BYTES_PER_ADC_ARRAY]
-    time_data       = raw[2 * BYTES_PER_ADC_ARRAY:]
-
-
-    cap_readings    = struct.unpack('<' + 'H' * N_SAMPLES, cap_adc_data)
-    therm_readings  = struct.unpack('<' + 'H' * N_SAMPLES, therm_adc_data)
-    total_time_us   = struct.unpack('<I', time_data)[0]
+    rec = decode_record(raw, 'legacy_8192')
+    cap_readings    = rec['cap']
+    therm_readings  = rec['therm']
+    total_time_us   = int(rec['total_time_us'])
 
 
     ADC_MAX     = 1023.0
@@ -60,8 +57,8 @@ def get_teensy_binary_data(fp):
     CONFIRM_SAMPLES = 5
     R_REF = 1000.0       # Reference resistor in ohms
     # process the data 
-    voltages = np.array(cap_readings) *V_REF / ADC_MAX 
-    voltage_therm = np.average(np.array(therm_readings) * V_REF / ADC_MAX)
+    voltages = cap_readings * (V_REF / ADC_MAX)
+    voltage_therm = np.average(therm_readings * (V_REF / ADC_MAX))
     R_therm = R_REF*voltage_therm/(V_REF-voltage_therm)
     T_therm = pt1000_lookup(R_therm)
     times = np.linspace(0, total_time_us, N_SAMPLES)
@@ -0,0 +1,137 @@
+import csv
+import datetime
+import io
+import os
+import time
+import zipfile
+
+import numpy as np
+
+from packed_log import MAGIC, open_packed_log
+from session_writer import MANIFEST_FILE
+from teensy_archive import CHUNK_SIZE, list_records, read_raw
+from teensy_records import RECORD_BYTES, decode_record
+
+
+REPLAY_GAP_S = 0.1   # firmware charge delay, added to each record's sampling time when no
+                     # manifest timestamps are available
+
+
+def is_packed_log(path):
+    """True if path is a packed log file (see packed_log.py)."""
+    if not os.path.isfile(path) or zipfile.is_zipfile(path):
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _manifest_rows(path):
+    """manifest.csv rows stored next to a packed log, in a directory or in a ZIP; [] if none."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path, 'r') as zf:
+            members = [n for n in zf.namelist() if os.path.basename(n) == MANIFEST_FILE]
+            if not members:
+                return []
+            text = zf.read(members[0]).decode('utf-8')
+    else:
+        directory = path if os.path.isdir(path) else os.path.dirname(path)
+        manifest = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(manifest):
+            return []
+        with open(manifest, 'r', newline='') as f:
+            text = f.read()
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def record_timestamps(path, keys):
+    """
+    Wall-clock acquisition times from the manifest.csv written by SessionWriter.
+
+
+    Parameters:
+        path (str): ZIP file, directory or packed log.
+        keys (sequence): Record file names (ZIP or directory) or log indices (packed log).
+
+
+    Returns:
+        ndarray: POSIX timestamps (s), NaN for records the manifest does not list.
+    """
+    if is_packed_log(path):
+        log = os.path.basename(path)
+        stamps = {int(r['index']): r['timestamp'] for r in _manifest_rows(path) if r['filename'] == log}
+    else:
+        stamps = {r['filename']: r['timestamp'] for r in _manifest_rows(path)}
+        keys = [os.path.basename(k) for k in keys]
+    return np.array([datetime.datetime.fromisoformat(stamps[k]).timestamp() if k in stamps else np.nan
+                     for k in keys], dtype=float)
+
+
+class ReplayReader:
+    """
+    Replay recorded runs as a packet source for AcquisitionThread (same read() as the live readers).
+
+
+    Records come from a ZIP archive, a log directory or a packed log, in acquisition order,
+    and read() raises EOFError after the last one. Pacing follows the manifest.csv timestamps
+    written by SessionWriter when every record has one, otherwise each record's own sampling
+    time plus REPLAY_GAP_S, divided by speed; speed=None replays as fast as possible.
+
+
+    Parameters:
+        path (str): ZIP file, directory or packed log of dual-rate records.
+        speed (float): Replay rate relative to real time (1 = real time, 100 = 100× faster),
+            or None for no pacing.
+        chunk_size (int): Records read from a ZIP or directory at a time.
+        prefix (str): Required file-name prefix (ZIP or directory).
+        ext (str): Required file-name extension (ZIP or directory).
+    """
+
+    def __init__(self, path, speed=None, chunk_size=CHUNK_SIZE, prefix='teensy_raw_', ext='.bin'):
+        self.path = path
+        self.speed = speed
+        self.chunk_size = int(chunk_size)
+        if is_packed_log(path):
+            self._log = open_packed_log(path)
+            self.names = list(range(len(self._log)))
+        else:
+            self._log = None
+            self.names = [n for n, size in list_records(path, prefix, ext) if size == RECORD_BYTES]
+        self.position = 0
+        self._chunk, self._chunk_start = None, 0
+        self._stamps = None
+        self._elapsed = 0.0      # replay-clock time of the next record without timestamps (s)
+        self._t0 = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def _raw(self, i):
+        if self._log is not None:
+            return self._log[i:i + 1].tobytes()
+        if self._chunk is None or not self._chunk_start <= i < self._chunk_start + len(self._chunk) // RECORD_BYTES:
+            self._chunk_start = i
+            self._chunk = read_raw(self.path, self.names[i:i + self.chunk_size])
+        k = i - self._chunk_start
+        return bytes(self._chunk[k * RECORD_BYTES:(k + 1) * RECORD_BYTES])
+
+    def read(self):
+        if self.position >= len(self.names):
+            raise EOFError("end of replay")
+        raw = self._raw(self.position)
+        if self.speed:
+            if self._t0 is None:
+                self._t0 = time.perf_counter()
+                stamps = record_timestamps(self.path, self.names)
+                self._stamps = stamps if stamps.size and np.isfinite(stamps).all() else None
+            if self._stamps is not None:
+                offset = self._stamps[self.position] - self._stamps[0]
+            else:
+                offset = self._elapsed
+                rec = decode_record(raw, 'dual_rate')
+                self._elapsed += (int(rec['t_high']) + int(rec['totalLow1'])
+                                  + int(rec['totalLow'])) * 1e-6 + REPLAY_GAP_S
+            delay = self._t0 + offset / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.position += 1
+        return raw
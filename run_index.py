@@ -0,0 +1,341 @@
+import datetime
+import hashlib
+import os
+import sqlite3
+import zipfile
+from collections import namedtuple
+
+import numpy as np
+
+from capacitance import fit_capacitance_batch
+from log_resample import log_resample
+from packed_log import HEADER, open_packed_log
+from pt1000 import thermistor_temperature
+from replay import is_packed_log, record_timestamps
+from teensy_archive import CHUNK_SIZE, Archive, list_records, read_raw, records_to_arrays
+from teensy_records import RECORD_BYTES, counts_to_volts, decode_records, dt_triples, time_axes
+
+
+INDEX_VERSION = 1
+
+# One row per indexed record. A source is a ZIP archive, log directory or packed log;
+# member is the ZIP member or file name (the log's own name for a packed log) and offset
+# the byte offset of the record within it (0 for one-record files).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id      INTEGER PRIMARY KEY,
+    path    TEXT UNIQUE NOT NULL,   -- absolute path
+    session TEXT NOT NULL,
+    size    INTEGER,                -- source size and mtime when last indexed
+    mtime   REAL,
+    R_ohm   REAL                    -- discharge resistor used for cap_pf
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,   -- increases with every indexed record
+    source_id   INTEGER NOT NULL REFERENCES sources(id),
+    member      TEXT NOT NULL,
+    offset      INTEGER NOT NULL,
+    seq         INTEGER NOT NULL,   -- acquisition order within the source
+    temperature REAL,               -- °C, NULL where out of range
+    cap_pf      REAL,               -- RC fit, NULL where it failed
+    fit_rms     REAL,               -- rms residual of the ln(v/v0) fit
+    dt_high     REAL,               -- µs/sample of the three segments
+    dt_low1     REAL,
+    dt_low2     REAL,
+    timestamp   REAL,               -- POSIX seconds (manifest.csv, else file time)
+    checksum    INTEGER NOT NULL,   -- 64-bit BLAKE2b of the raw record (signed)
+    UNIQUE (source_id, member, offset)
+);
+CREATE INDEX IF NOT EXISTS runs_temperature ON runs (temperature);
+CREATE INDEX IF NOT EXISTS runs_timestamp ON runs (timestamp);
+CREATE INDEX IF NOT EXISTS runs_checksum ON runs (checksum);
+"""
+
+# session:  session label of the source
+# path:     source ZIP, directory or packed log
+# member, offset, seq, temperature, cap_pf, fit_rms, timestamp, checksum: as in SCHEMA
+# dts:      (dt_high, dt_low1, dt_low2) in µs
+# run_id:   runs.id, larger for records indexed later
+RunRow = namedtuple('RunRow', ['session', 'path', 'member', 'offset', 'seq', 'temperature',
+                               'cap_pf', 'fit_rms', 'dts', 'timestamp', 'checksum', 'run_id'])
+
+_ROW_SQL = """
+SELECT s.session, s.path, r.member, r.offset, r.seq, r.temperature, r.cap_pf, r.fit_rms,
+       r.dt_high, r.dt_low1, r.dt_low2, r.timestamp, r.checksum, r.id
+FROM runs r JOIN sources s ON s.id = r.source_id
+"""
+
+
+def _finite(x):
+    """Python float, or None (SQL NULL) for NaN/inf."""
+    x = float(x)
+    return x if np.isfinite(x) else None
+
+
+def record_checksum(raw):
+    """64-bit BLAKE2b of a raw record as a signed integer (fits an SQLite INTEGER)."""
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'little', signed=True)
+
+
+def _posix(t):
+    """POSIX seconds from a datetime or a number."""
+    return t.timestamp() if isinstance(t, datetime.datetime) else float(t)
+
+
+def _file_times(path, names):
+    """Fallback record times: ZIP member dates or file modification times (POSIX s)."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path, 'r') as zf:
+            return [datetime.datetime(*zf.getinfo(n).date_time).timestamp() for n in names]
+    return [os.path.getmtime(os.path.join(path, n)) for n in names]
+
+
+class RunIndex:
+    """
+    SQLite index of the records in one or more archives, for selecting runs without parsing them.
+
+
+    update() parses each record once and stores where it lives (source, member, offset)
+    with its temperature, RC capacitance and fit residual, dt triple, acquisition time and
+    content checksum. Later calls only look at a source again when its size or modification time has
+    changed, and then only parse members (or packed-log records) not yet in the index, so
+    keeping the index current during a live session costs time proportional to the new
+    runs. select() answers temperature / time / fit-quality queries from indexed columns,
+    and load() decodes just the selected records. Usable as a context manager.
+
+
+    Parameters:
+        db_path (str): SQLite database file (created if needed).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version == 0:
+            self.db.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+        elif version != INDEX_VERSION:
+            raise ValueError(f"{db_path}: unsupported run index version {version}")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    def sessions(self):
+        """Session labels with their number of indexed runs, as {session: count}."""
+        return dict(self.db.execute("""SELECT s.session, COUNT(r.source_id) FROM sources s
+                                       LEFT JOIN runs r ON r.source_id = s.id GROUP BY s.session"""))
+
+    def _source(self, path, session, R_ohm):
+        """(id, size, mtime) of a source, registering it if new. session=None keeps the stored label."""
+        row = self.db.execute('SELECT id, size, mtime, R_ohm FROM sources WHERE path = ?',
+                              (path,)).fetchone()
+        if row is None:
+            session = session or os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+            cur = self.db.execute('INSERT INTO sources (path, session, R_ohm) VALUES (?, ?, ?)',
+                                  (path, session, R_ohm))
+            return cur.lastrowid, None, None
+        if row[3] != R_ohm:
+            raise ValueError(f"{path} was indexed with R_ohm={row[3]}, not {R_ohm}")
+        if session is not None:
+            self.db.execute('UPDATE sources SET session = ? WHERE id = ?', (session, row[0]))
+        return row[0], row[1], row[2]
+
+    def update(self, path, R_ohm, session=None, table=None, chunk_size=CHUNK_SIZE,
+               points_per_decade=None, prefix='teensy_raw_', ext='.bin',
+               on_chunk=None):
+        """
+        Add the records of a ZIP archive, log directory or packed log that are not indexed yet.
+
+
+        Records that disappeared from the source are dropped from the index. Progress is
+        committed chunk by chunk, so an interrupted update resumes where it stopped.
+        on_chunk, if given, is called after each commit with the chunk's new run ids and
+        its decoded samples, so callers can use them without decoding the records again.
+
+
+        Parameters:
+            path (str): ZIP file, directory or packed log of dual-rate records.
+            R_ohm (float): Discharge resistor (Ω) for the capacitance fit.
+            session (str): Session label. Default: the stored label, or for a new source
+                its file name without extension.
+            table (tuple): Optional pt1000.LOOKUP_TABLES key for the temperature conversion.
+            chunk_size (int): Records parsed per step.
+            points_per_decade (int): Log resampling before the fit (None: fit every sample).
+            prefix (str): Required file-name prefix (ZIP or directory).
+            ext (str): Required file-name extension (ZIP or directory).
+            on_chunk (callable): Optional on_chunk(run_ids, counts, dts) with the run_id
+                list, ADC counts (n, N_SAMPLES) and dt triples (n, 3) of each chunk.
+
+
+        Returns:
+            int: Number of newly indexed records.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        size, mtime = st.st_size, st.st_mtime
+        if os.path.isdir(path):
+            # a directory's own size/mtime does not change when a file grows
+            names = [n for n, s in list_records(path, prefix, ext) if s == RECORD_BYTES]
+            size, mtime = len(names), max([os.path.getmtime(os.path.join(path, n)) for n in names],
+                                          default=mtime)
+        source_id, old_size, old_mtime = self._source(path, session, float(R_ohm))
+        if (old_size, old_mtime) == (size, mtime):
+            self.db.commit()
+            return 0
+
+        known = {(m, o) for m, o in self.db.execute(
+            'SELECT member, offset FROM runs WHERE source_id = ?', (source_id,))}
+        if is_packed_log(path):
+            log = open_packed_log(path)
+            member = os.path.basename(path)
+            keys = [(member, HEADER.itemsize + i * RECORD_BYTES) for i in range(len(log))]
+        else:
+            log = None
+            keys = [(n, 0) for n, s in list_records(path, prefix, ext) if s == RECORD_BYTES]
+        gone = known - set(keys)
+        self.db.executemany('DELETE FROM runs WHERE source_id = ? AND member = ? AND offset = ?',
+                            [(source_id, m, o) for m, o in gone])
+        new = [(seq, key) for seq, key in enumerate(keys) if key not in known]
+
+        # manifest.csv and the fallback file times are read once for all new records
+        if log is not None:
+            all_idx = [(o - HEADER.itemsize) // RECORD_BYTES for _, (_, o) in new]
+            all_stamps = record_timestamps(path, all_idx)
+            all_fallback = [mtime] * len(new)
+        else:
+            all_names = [m for _, (m, _) in new]
+            all_stamps = record_timestamps(path, all_names)
+            all_fallback = _file_times(path, all_names)
+
+        for i in range(0, len(new), chunk_size):
+            chunk = new[i:i + chunk_size]
+            stamps, fallback = all_stamps[i:i + chunk_size], all_fallback[i:i + chunk_size]
+            if log is not None:
+                raw = log[all_idx[i:i + chunk_size]].tobytes()
+            else:
+                raw = read_raw(path, all_names[i:i + chunk_size])
+            counts, timing, avg_therm = records_to_arrays(decode_records(raw))
+            dts = dt_triples(timing)
+            temps = thermistor_temperature(avg_therm, table)
+            v = counts_to_volts(counts)
+            if points_per_decade:
+                res = log_resample(v, dts, points_per_decade)
+                fit = fit_capacitance_batch(res.t, res.V, R_ohm, weights=res.counts)
+            else:
+                fit = fit_capacitance_batch(time_axes(dts), v, R_ohm)
+            rows = []
+            for k, (seq, (member, offset)) in enumerate(chunk):
+                rec = raw[k * RECORD_BYTES:(k + 1) * RECORD_BYTES]
+                stamp = stamps[k] if np.isfinite(stamps[k]) else fallback[k]
+                rows.append((source_id, member, offset, seq, _finite(temps[k]), _finite(fit.C_pf[k]),
+                             _finite(fit.rms[k]), *map(float, dts[k]), _finite(stamp),
+                             record_checksum(rec)))
+            # AUTOINCREMENT ids are larger than any used before, in insertion order
+            first_id = self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence "
+                                       "WHERE name = 'runs'").fetchone()[0] + 1
+            self.db.executemany("""INSERT INTO runs (source_id, member, offset, seq, temperature, cap_pf,
+                                   fit_rms, dt_high, dt_low1, dt_low2, timestamp, checksum)
+                                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+            self.db.commit()
+            if on_chunk is not None:
+                run_ids = [r[0] for r in self.db.execute(
+                    'SELECT id FROM runs WHERE id >= ? ORDER BY id', (first_id,))]
+                on_chunk(run_ids, counts, dts)
+
+        self.db.execute('UPDATE sources SET size = ?, mtime = ? WHERE id = ?', (size, mtime, source_id))
+        self.db.commit()
+        return len(new)
+
+    def select(self, T_min=None, T_max=None, session=None, since=None, until=None,
+               max_rms=None, fitted=False, after=None, unique=False, run_ids=None, limit=None):
+        """
+        Indexed runs matching all of the given conditions, in acquisition order.
+
+
+        Parameters:
+            T_min, T_max (float): Temperature range (°C), inclusive.
+            session (str or sequence): Session label(s).
+            since, until (datetime or float): Acquisition time range (datetime or POSIX s).
+            max_rms (float): Largest accepted rms residual of the capacitance fit.
+            fitted (bool): Only runs whose capacitance fit succeeded.
+            after (int): Only runs indexed after the run with this run_id.
+            unique (bool): Skip runs whose content was indexed before, e.g. the same
+                record in both a log directory and a ZIP made from it.
+            run_ids (sequence of int): Only these runs.
+            limit (int): Return at most this many runs.
+
+
+        Returns:
+            list: RunRow per matching record.
+        """
+        where, args = [], []
+        if T_min is not None:
+            where.append('r.temperature >= ?'); args.append(float(T_min))
+        if T_max is not None:
+            where.append('r.temperature <= ?'); args.append(float(T_max))
+        if session is not None:
+            sessions = [session] if isinstance(session, str) else list(session)
+            where.append(f"s.session IN ({', '.join('?' * len(sessions))})"); args += sessions
+        if since is not None:
+            where.append('r.timestamp >= ?'); args.append(_posix(since))
+        if until is not None:
+            where.append('r.timestamp <= ?'); args.append(_posix(until))
+        if max_rms is not None:
+            where.append('r.fit_rms <= ?'); args.append(float(max_rms))
+        if fitted:
+            where.append('r.cap_pf IS NOT NULL')
+        if after is not None:
+            where.append('r.id > ?'); args.append(int(after))
+        if run_ids is not None:
+            run_ids = [int(i) for i in run_ids]
+            where.append(f"r.id IN ({', '.join('?' * len(run_ids))})"); args += run_ids
+        if unique:
+            where.append('NOT EXISTS (SELECT 1 FROM runs p WHERE p.checksum = r.checksum AND p.id < r.id)')
+        sql = _ROW_SQL + (' WHERE ' + ' AND '.join(where) if where else '')
+        sql += ' ORDER BY r.source_id, r.seq'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        return [RunRow(*r[:8], r[8:11], *r[11:]) for r in self.db.execute(sql, args)]
+
+    def last_run_id(self):
+        """run_id of the most recently indexed run (0 for an empty index)."""
+        return self.db.execute('SELECT COALESCE(MAX(id), 0) FROM runs').fetchone()[0]
+
+    def load(self, rows):
+        """
+        Decode only the given runs.
+
+
+        Parameters:
+            rows (sequence of RunRow): Runs from select().
+
+
+        Returns:
+            Archive: teensy_archive.Archive of the runs in the order given; names are
+            the members (packed-log records as 'log.tlog@offset').
+        """
+        buf = bytearray(len(rows) * RECORD_BYTES)
+        by_source = {}
+        for i, row in enumerate(rows):
+            by_source.setdefault(row.path, []).append(i)
+        for path, pos in by_source.items():
+            if is_packed_log(path):
+                log = open_packed_log(path)
+                raw = log[[(rows[i].offset - HEADER.itemsize) // RECORD_BYTES for i in pos]].tobytes()
+            else:
+                raw = read_raw(path, [rows[i].member for i in pos])
+            for k, i in enumerate(pos):
+                buf[i * RECORD_BYTES:(i + 1) * RECORD_BYTES] = raw[k * RECORD_BYTES:(k + 1) * RECORD_BYTES]
+        counts, timing, avg_therm = records_to_arrays(decode_records(buf))
+        names = [f"{r.member}@{r.offset}" if r.offset else r.member for r in rows]
+        return Archive(names, counts, timing, avg_therm, [])
@@ -0,0 +1,180 @@
+import json
+import os
+
+import numpy as np
+
+from pt1000 import thermistor_temperature
+from teensy_archive import CHUNK_SIZE, list_records, read_raw, records_to_arrays
+from teensy_records import N_SAMPLES, RECORD_BYTES, counts_to_volts, decode_records, dt_triples
+from temperature_bins import DELTA_T, BinStats, TemperatureBins
+
+
+# A run store is a directory of .npy columns plus index.json:
+#   counts.npy (n, N_SAMPLES) uint16   dts.npy (n, 3) µs   temps.npy (n,) °C
+#   bin_*.npy   per-bin T, T_mean, count, mean, std and dts (TemperatureBins.summary)
+#   ds_x.npy / ds_y.npy   all merged_data.json datasets back to back, sliced via the index
+INDEX_FILE = 'index.json'
+STORE_VERSION = 1
+
+
+def _save(path, key, arr):
+    np.save(os.path.join(path, key + '.npy'), np.ascontiguousarray(arr))
+
+
+def _write_bins(path, bins):
+    """Save TemperatureBins.summary() as bin_* columns; returns the index entry."""
+    stats = bins.summary()
+    n = len(stats)
+    _save(path, 'bin_T', np.array([s.T_bin for s in stats], dtype=float))
+    _save(path, 'bin_T_mean', np.array([s.T_mean for s in stats], dtype=float))
+    _save(path, 'bin_count', np.array([s.count for s in stats], dtype=np.int64))
+    _save(path, 'bin_mean', np.array([s.mean for s in stats], dtype=float).reshape(n, N_SAMPLES))
+    _save(path, 'bin_std', np.array([s.std for s in stats], dtype=float).reshape(n, N_SAMPLES))
+    _save(path, 'bin_dts', np.array([s.dts for s in stats], dtype=float).reshape(n, 3))
+    return {'delta_T': bins.delta_T, 'n_bins': n}
+
+
+def _write_archive(path, archive_path, delta_T, table, chunk_size):
+    """Stream an archive into counts/dts/temps columns and bin averages; returns index entries."""
+    names = [n for n, size in list_records(archive_path) if size == RECORD_BYTES]
+    counts = np.lib.format.open_memmap(os.path.join(path, 'counts.npy'), mode='w+',
+                                       dtype=np.uint16, shape=(len(names), N_SAMPLES))
+    dts = np.empty((len(names), 3))
+    temps = np.empty(len(names))
+    bins = TemperatureBins(N_SAMPLES, delta_T)
+    for i in range(0, len(names), chunk_size):
+        sl = slice(i, i + chunk_size)
+        recs = decode_records(read_raw(archive_path, names[sl]))
+        counts[sl], timing, avg_therm = records_to_arrays(recs)
+        dts[sl] = dt_triples(timing)
+        temps[sl] = thermistor_temperature(avg_therm, table)
+        bins.add_batch(temps[sl], counts_to_volts(counts[sl]), dts[sl])
+    counts.flush()
+    del counts
+    _save(path, 'dts', dts)
+    _save(path, 'temps', temps)
+    return {'names': names, 'source': os.path.abspath(archive_path)}, _write_bins(path, bins)
+
+
+def _write_json(path, json_path):
+    """Copy merged_data.json datasets into ds_x/ds_y columns; returns the index entry."""
+    with open(json_path, 'r') as f:
+        datasets = json.load(f)['datasets']
+    index, xs, ys, offset = {}, [], [], 0
+    for name, ds in datasets.items():
+        x = np.asarray(ds['x'], dtype=float)
+        y = np.asarray(ds['y'], dtype=float)
+        index[name] = {'offset': offset, 'length': int(x.size), 'temperature': ds['temperature']}
+        xs.append(x)
+        ys.append(y)
+        offset += x.size
+    _save(path, 'ds_x', np.concatenate(xs) if xs else np.empty(0))
+    _save(path, 'ds_y', np.concatenate(ys) if ys else np.empty(0))
+    return index
+
+
+def convert_to_store(store_path, archive_path=None, json_path=None, delta_T=DELTA_T,
+                     table=None, chunk_size=CHUNK_SIZE):
+    """
+    One-shot conversion of a ZIP archive / log directory and/or merged_data.json to a run store.
+
+
+    Raw counts are written chunk by chunk into a memory-mapped counts.npy, so the archive is
+    never held in memory as a whole; per-bin voltage averages are accumulated on the way.
+
+
+    Parameters:
+        store_path (str): Output directory (created if needed).
+        archive_path (str): Optional ZIP file or directory of dual-rate records.
+        json_path (str): Optional merged_data.json with a 'datasets' mapping.
+        delta_T (float): Bin width for the per-bin averages (°C).
+        table (tuple): Optional pt1000.LOOKUP_TABLES key for the temperature conversion.
+        chunk_size (int): Records decoded per step.
+
+
+    Returns:
+        RunStore: The opened store.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    index = {'version': STORE_VERSION, 'n_samples': N_SAMPLES}
+    if archive_path is not None:
+        index['records'], index['bins'] = _write_archive(store_path, archive_path, delta_T,
+                                                         table, chunk_size)
+    if json_path is not None:
+        index['datasets'] = _write_json(store_path, json_path)
+    with open(os.path.join(store_path, INDEX_FILE), 'w') as f:
+        json.dump(index, f)
+    return RunStore(store_path)
+
+
+class RunStore:
+    """
+    Read side of a run store: every column is opened lazily with np.load(mmap_mode='r').
+
+
+    Only index.json is parsed on open; a dataset or record slice touches just its own bytes.
+
+
+    Parameters:
+        path (str): Store directory written by convert_to_store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
+        if self.index.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported run store version {self.index.get('version')}")
+        self._columns = {}
+
+    def column(self, key):
+        """Memory-mapped column key (e.g. 'counts', 'temps', 'bin_mean')."""
+        if key not in self._columns:
+            self._columns[key] = np.load(os.path.join(self.path, key + '.npy'), mmap_mode='r')
+        return self._columns[key]
+
+    # ---- raw records ----
+    @property
+    def names(self):
+        return self.index.get('records', {}).get('names', [])
+
+    @property
+    def counts(self):
+        return self.column('counts')
+
+    @property
+    def dts(self):
+        return self.column('dts')
+
+    @property
+    def temps(self):
+        return self.column('temps')
+
+    # ---- bin averages ----
+    def bin_stats(self):
+        """Per-bin voltage averages as BinStats, coldest first (see TemperatureBins.summary)."""
+        T, T_mean, count = self.column('bin_T'), self.column('bin_T_mean'), self.column('bin_count')
+        mean, std, dts = self.column('bin_mean'), self.column('bin_std'), self.column('bin_dts')
+        return [BinStats(float(T[i]), float(T_mean[i]), int(count[i]), mean[i], std[i],
+                         std[i] / np.sqrt(count[i]), dts[i]) for i in range(T.size)]
+
+    # ---- merged_data.json datasets ----
+    @property
+    def dataset_names(self):
+        return list(self.index.get('datasets', {}))
+
+    def dataset(self, name):
+        """
+        One dataset of the converted merged_data.json, without reading the others.
+
+
+        Parameters:
+            name (str): Dataset name, e.g. 'dataset_9'.
+
+
+        Returns:
+            tuple: (x, y, temperature) with x and y as read-only float64 views.
+        """
+        meta = self.index['datasets'][name]
+        sl = slice(meta['offset'], meta['offset'] + meta['length'])
+        return self.column('ds_x')[sl], self.column('ds_y')[sl], meta['temperature']
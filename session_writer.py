@@ -0,0 +1,126 @@
+import csv
+import datetime
+import os
+import re
+from collections import namedtuple
+
+from packed_log import PackedLogWriter
+
+
+MANIFEST_FILE = 'manifest.csv'
+MANIFEST_FIELDS = ['index', 'filename', 'timestamp', 'temperature_C', 'bytes']
+
+# One manifest line: run index, file (or packed log) name, ISO wall-clock time,
+# temperature in °C (NaN if unknown) and record size in bytes
+ManifestEntry = namedtuple('ManifestEntry', MANIFEST_FIELDS)
+
+
+class SessionWriter:
+    """
+    Hand out sequential run files for a logging session and keep a manifest of them.
+
+
+    The directory is scanned once at start-up for the highest existing index; after that
+    indices come from memory, so saving a run costs no existence checks however many files
+    the directory holds. Every saved record appends one line to manifest.csv. With
+    packed_log set, records go into that packed log instead of one file each and the index
+    is the record's position in the log.
+
+
+    Parameters:
+        directory (str): Output directory (created if needed).
+        prefix (str): File-name prefix including any separator, e.g. 'teensy_raw_' or 'raw_binary'.
+        ext (str): File extension.
+        packed_log (str): Optional packed log path (see packed_log.py).
+    """
+
+    def __init__(self, directory, prefix='teensy_raw_', ext='.bin', packed_log=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.ext = ext
+        self.log = PackedLogWriter(packed_log) if packed_log else None
+        if self.log is not None:
+            self.next_index = self.log.count
+        else:
+            pattern = re.compile(re.escape(prefix) + r'(\d+)' + re.escape(ext) + '$')
+            found = [int(m.group(1)) for m in map(pattern.match, os.listdir(directory)) if m]
+            self.next_index = max(found, default=0) + 1
+
+        manifest = os.path.join(directory, MANIFEST_FILE)
+        new = not os.path.exists(manifest) or os.path.getsize(manifest) == 0
+        self._manifest = open(manifest, 'a', newline='')
+        self._csv = csv.writer(self._manifest)
+        if new:
+            self._csv.writerow(MANIFEST_FIELDS)
+            self._manifest.flush()
+
+    def next_path(self):
+        """
+        Reserve the next run file.
+
+
+        Returns:
+            tuple: (path, fname, index).
+        """
+        index = self.next_index
+        self.next_index += 1
+        fname = f"{self.prefix}{index}{self.ext}"
+        return os.path.join(self.directory, fname), fname, index
+
+    def write(self, raw, temperature=None):
+        """
+        Save one raw record and log it in the manifest.
+
+
+        Parameters:
+            raw (bytes-like): Raw record.
+            temperature (float): Record temperature (°C), if known.
+
+
+        Returns:
+            tuple: (path, fname, index) of the saved record.
+        """
+        if self.log is not None:
+            index = self.log.append(raw)
+            self.next_index = index + 1
+            path = self.log.path
+            fname = os.path.basename(path)
+        else:
+            path, fname, index = self.next_path()
+            with open(path, 'wb') as f:
+                f.write(raw)
+        T = float('nan') if temperature is None else float(temperature)
+        self._csv.writerow([index, fname, datetime.datetime.now().isoformat(timespec='milliseconds'),
+                            f"{T:.3f}", len(raw)])
+        self._manifest.flush()
+        return path, fname, index
+
+    def close(self):
+        self._manifest.close()
+        if self.log is not None:
+            self.log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_manifest(directory):
+    """
+    Read a session's manifest instead of listing its directory.
+
+
+    Parameters:
+        directory (str): Session directory containing manifest.csv.
+
+
+    Returns:
+        list: ManifestEntry per saved record, in write order.
+    """
+    with open(os.path.join(directory, MANIFEST_FILE), 'r', newline='') as f:
+        return [ManifestEntry(int(row['index']), row['filename'], row['timestamp'],
+                              float(row['temperature_C']), int(row['bytes']))
+                for row in csv.DictReader(f)]
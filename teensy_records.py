@@ -0,0 +1,209 @@
+import functools
+
+import numpy as np
+
+
+# ---- Dual-rate firmware (optimized_tdischarge.txt) ----
+S_HIGH  = 50      # high-speed samples (10-bit)
+S_LOW   = 16000   # low-speed samples (12-bit)
+S_LOW1  = 1200    # low-speed phase 1 (no averaging); the rest is phase 2
+S_LOW2  = S_LOW - S_LOW1
+N_SAMPLES = S_HIGH + S_LOW                   # samples per record once vh and vl are joined
+SEGMENT_LENGTHS = (S_HIGH, S_LOW1, S_LOW2)   # uniformly sampled segments in time order
+
+V_REF      = 3.3
+ADC_MAX_10 = 1023.0   # high-speed phase resolution
+ADC_MAX_12 = 4095.0   # low-speed phase resolution
+
+TIME_QUANTUM_US = 1          # time_axis cache key resolution (firmware timings are whole µs)
+TIME_AXIS_CACHE_SIZE = 256   # distinct time bases kept by time_axis
+
+# Volts per ADC count for each column of a joined [vh, vl] record
+VOLTS_PER_COUNT = np.concatenate([np.full(S_HIGH, V_REF / ADC_MAX_10),
+                                  np.full(S_LOW, V_REF / ADC_MAX_12)])
+
+# Each firmware packet as a packed little-endian structured dtype, in transmit order
+DUAL_RATE = np.dtype([
+    ('vh',        '<u2', (S_HIGH,)),   # high-speed ADC counts
+    ('t_high',    '<u4'),              # high-speed phase duration (µs)
+    ('vl',        '<u2', (S_LOW,)),    # low-speed ADC counts
+    ('totalLow1', '<u4'),              # low-speed phase 1 duration (µs)
+    ('totalLow',  '<u4'),              # low-speed phase 2 duration (µs)
+    ('avgTherm',  '<f4'),              # averaged thermistor ADC counts
+])
+
+LEGACY_8192 = np.dtype([               # thermistor_discharge.txt / read_teensy_binary.py
+    ('cap',           '<u2', (8192,)),
+    ('therm',         '<u2', (8192,)),
+    ('total_time_us', '<u4'),
+])
+
+LEGACY_16384 = np.dtype([              # thermistor_discharge/binaryanalysis_savejpeg.py
+    ('adc0',          '<u2', (16384,)),
+    ('adc1',          '<u2', (16384,)),
+    ('total_time_us', '<u4'),
+])
+
+JULY_29 = np.dtype([                   # july_29.ipynb / plot_savecbin.py (1000 high-speed samples)
+    ('vh',       '<u2', (1000,)),
+    ('t_high',   '<u4'),
+    ('vl',       '<u2', (S_LOW,)),
+    ('t_low',    '<u4'),
+    ('avgTherm', '<f4'),
+])
+
+LAYOUTS = {
+    'dual_rate':    DUAL_RATE,
+    'legacy_8192':  LEGACY_8192,
+    'legacy_16384': LEGACY_16384,
+    'july_29':      JULY_29,
+}
+
+LAYOUT_BY_SIZE = {dt.itemsize: name for name, dt in LAYOUTS.items()}
+
+RECORD_BYTES = DUAL_RATE.itemsize  # 32116
+
+
+def detect_layout(nbytes):
+    """
+    Identify the firmware layout of a single record from its length in bytes.
+
+
+    Parameters:
+        nbytes (int): Size of one raw record (bytes).
+
+
+    Returns:
+        str: Key into LAYOUTS.
+    """
+    try:
+        return LAYOUT_BY_SIZE[nbytes]
+    except KeyError:
+        sizes = ', '.join(f"{n}={s}" for s, n in LAYOUT_BY_SIZE.items())
+        raise ValueError(f"Unknown record size {nbytes} bytes (known: {sizes})") from None
+
+
+def decode_records(buf, layout='dual_rate'):
+    """
+    View a buffer of back-to-back records as a structured array (zero-copy).
+
+
+    Parameters:
+        buf (bytes-like): One or more raw records.
+        layout (str): Key into LAYOUTS.
+
+
+    Returns:
+        ndarray: Read-only structured array of shape (n_records,).
+    """
+    dtype = LAYOUTS[layout]
+    if len(buf) % dtype.itemsize:
+        raise ValueError(f"Buffer of {len(buf)} bytes is not a whole number of "
+                         f"{layout} records ({dtype.itemsize} bytes)")
+    return np.frombuffer(buf, dtype=dtype)
+
+
+def decode_record(raw, layout=None):
+    """
+    Decode one raw record (zero-copy); the layout is detected from its size when not given.
+
+
+    Parameters:
+        raw (bytes-like): A single raw record.
+        layout (str): Optional key into LAYOUTS.
+
+
+    Returns:
+        np.void: Structured record; fields are accessed by name, e.g. rec['vh'].
+    """
+    if layout is None:
+        layout = detect_layout(len(raw))
+    elif len(raw) != LAYOUTS[layout].itemsize:
+        raise ValueError(f"Bad record size {len(raw)} (expected {LAYOUTS[layout].itemsize})")
+    return np.frombuffer(raw, dtype=LAYOUTS[layout], count=1)[0]
+
+
+def counts_to_volts(counts):
+    """
+    Convert joined [vh, vl] ADC counts to volts, for one record or a stack of records.
+
+
+    Parameters:
+        counts (ndarray): ADC counts, shape (..., N_SAMPLES).
+
+
+    Returns:
+        ndarray: Voltages (V), float64, same shape.
+    """
+    return counts * VOLTS_PER_COUNT
+
+
+def dt_triples(timing):
+    """
+    Per-sample intervals of the three segments from the firmware phase durations.
+
+
+    totalLow is the duration of phase 2 alone (the firmware restarts its timer after
+    phase 1), matching automated_loop1.py.
+
+
+    Parameters:
+        timing (ndarray): (t_high, totalLow1, totalLow) in µs, shape (..., 3).
+
+
+    Returns:
+        ndarray: (dt_high, dt_low1, dt_low2) in µs, shape (..., 3).
+    """
+    return np.asarray(timing, dtype=float) / np.array(SEGMENT_LENGTHS, dtype=float)
+
+
+def time_axes(dts):
+    """
+    Build the concatenated time axis of one or more records from their dt triples.
+
+
+    Segment k starts one dt after the last sample of segment k-1, as in the parsers.
+
+
+    Parameters:
+        dts (ndarray): (dt_high, dt_low1, dt_low2) in µs, shape (..., 3).
+
+
+    Returns:
+        ndarray: Time axes (µs), shape (..., N_SAMPLES).
+    """
+    dts = np.asarray(dts, dtype=float)
+    starts = np.cumsum(dts * np.array(SEGMENT_LENGTHS), axis=-1) - dts * np.array(SEGMENT_LENGTHS)
+    parts = [starts[..., k, None] + dts[..., k, None] * np.arange(n)
+             for k, n in enumerate(SEGMENT_LENGTHS)]
+    return np.concatenate(parts, axis=-1)
+
+
+@functools.lru_cache(maxsize=TIME_AXIS_CACHE_SIZE)
+def _time_axis_for(key, quantum):
+    """Read-only time axis for a quantised (t_high, totalLow1, totalLow) key."""
+    t = time_axes(dt_triples(np.array(key, dtype=float) * quantum))
+    t.setflags(write=False)
+    return t
+
+
+def time_axis(dts, quantum=TIME_QUANTUM_US):
+    """
+    Shared, lazily built time axis for one record's dt triple.
+
+
+    The axis is cached under the phase durations (dt × segment length) rounded to quantum µs,
+    so records, or bin averages, with the same timing share one read-only array instead of
+    each building and storing its own. Do not modify the returned array.
+
+
+    Parameters:
+        dts (sequence of float): (dt_high, dt_low1, dt_low2) in µs.
+        quantum (float): Rounding of the phase durations for the cache key (µs).
+
+
+    Returns:
+        ndarray: Time axis (µs), shape (N_SAMPLES,).
+    """
+    key = tuple(int(round(d * n / quantum)) for d, n in zip(dts, SEGMENT_LENGTHS))
+    return _time_axis_for(key, quantum)
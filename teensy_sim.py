@@ -0,0 +1,365 @@
+import functools
+import os
+import threading
+import time
+
+import numpy as np
+
+from framing import encode_frame
+from pt1000 import R_REF, pt1000_resistance
+from teensy_records import (ADC_MAX_10, ADC_MAX_12, DUAL_RATE, S_HIGH, SEGMENT_LENGTHS, V_REF,
+                            time_axis)
+from transform_dielectric_data import V_debye_sim
+
+
+SIM_DTS = (0.5, 2.0, 20.0)      # default (dt_high, dt_low1, dt_low2) in µs/sample
+CHARGE_S = 0.1                  # firmware charge delay before every measurement
+K_B_EV = 8.617333262e-5         # Boltzmann constant (eV/K)
+
+# Default Debye cell: series resistor and empty-cell capacitance, and a relaxation time
+# tau_ref at T_ref that follows an Arrhenius law with activation energy Ea_eV
+DEBYE = dict(R=1e6, C0=10e-12, k0=3.0, Delta_k=20.0, tau_ref=1e-4, rho=1e9, Ea_eV=0.3, T_ref=20.0)
+
+
+@functools.lru_cache(maxsize=64)
+def _debye_curve(dts, T, params):
+    """Debye response (V, charged to 1) on the record time axis for temperature T (°C)."""
+    p = dict(params)
+    t_us = time_axis(dts)
+    dt = dts[0] * 1e-6
+    t = np.arange(int(np.ceil(t_us[-1] * 1e-6 / dt)) + 1) * dt
+    T_K, T_ref_K = T + 273.15, p['T_ref'] + 273.15
+    tau = p['tau_ref'] * np.exp(p['Ea_eV'] / K_B_EV * (1 / T_K - 1 / T_ref_K))
+    V = V_debye_sim(t, p['R'], p['C0'], p['k0'], p['Delta_k'], tau, p['rho'])
+    return np.interp(t_us * 1e-6, t, V + 0.5)   # the model swings from +0.5 to -0.5
+
+
+class DecayModel:
+    """
+    Synthetic dual-rate records for a cell cooling (or warming) at a constant rate.
+
+
+    By default each curve is an RC discharge whose capacitance drifts linearly with
+    temperature; with debye=True it is the Debye-dielectric response of
+    transform_dielectric_data.V_debye_sim with an Arrhenius relaxation time (see DEBYE).
+    Voltages are quantised like the firmware: 10-bit for the high-speed phase, 12-bit after.
+
+
+    Parameters:
+        dts (tuple): (dt_high, dt_low1, dt_low2) in µs/sample.
+        T_start (float): Temperature at time 0 (°C).
+        ramp_C_per_min (float): Temperature rate (°C/min, negative when cooling).
+        T_end (float): Temperature at which the ramp stops (°C).
+        v_charge (float): Voltage the capacitor is charged to (V).
+        tau_us (float): RC time constant at 20 °C for the default model (µs).
+        tau_per_C (float): Relative change of the RC time constant per °C.
+        noise_v (float): Gaussian noise on each sample (V).
+        debye (bool or dict): Use the Debye model, optionally overriding DEBYE entries.
+        seed (int): Random seed.
+    """
+
+    def __init__(self, dts=SIM_DTS, T_start=20.0, ramp_C_per_min=-1.0, T_end=-80.0, v_charge=3.2,
+                 tau_us=20.0, tau_per_C=2e-3, noise_v=2e-3, debye=False, seed=None):
+        self.dts = tuple(float(d) for d in dts)
+        self.T_start = float(T_start)
+        self.ramp = float(ramp_C_per_min)
+        self.T_end = float(T_end)
+        self.v_charge = float(v_charge)
+        self.tau_us = float(tau_us)
+        self.tau_per_C = float(tau_per_C)
+        self.noise_v = float(noise_v)
+        self.debye = None
+        if debye:
+            self.debye = tuple(sorted({**DEBYE, **(debye if isinstance(debye, dict) else {})}.items()))
+        self.rng = np.random.default_rng(seed)
+        self.t_us = time_axis(self.dts)
+        self.timing = np.round(np.array(self.dts) * SEGMENT_LENGTHS).astype(np.uint32)
+
+    @property
+    def duration_s(self):
+        """Sampling time of one record (s), excluding the charge delay."""
+        return float(self.timing.sum()) * 1e-6
+
+    def temperature(self, elapsed_s):
+        """Cell temperature after elapsed_s seconds (°C)."""
+        T = self.T_start + self.ramp * elapsed_s / 60.0
+        if self.ramp < 0:
+            return max(T, self.T_end)
+        return min(T, self.T_end) if self.ramp > 0 else T
+
+    def curve(self, T):
+        """Noise-free voltage curve at temperature T (°C), shape (N_SAMPLES,)."""
+        if self.debye is not None:
+            return self.v_charge * _debye_curve(self.dts, round(T, 1), self.debye)
+        tau = self.tau_us * (1 + self.tau_per_C * (T - 20.0))
+        return self.v_charge * np.exp(-self.t_us / tau)
+
+    def record(self, elapsed_s):
+        """
+        One raw dual-rate record as the firmware would send it.
+
+
+        Parameters:
+            elapsed_s (float): Time since the start of the ramp (s).
+
+
+        Returns:
+            bytes: DUAL_RATE record.
+        """
+        T = self.temperature(elapsed_s)
+        v = self.curve(T) + self.rng.normal(0.0, self.noise_v, self.t_us.size)
+        rec = np.zeros(1, dtype=DUAL_RATE)
+        rec['vh'] = np.clip(np.round(v[:S_HIGH] / V_REF * ADC_MAX_10), 0, ADC_MAX_10)
+        rec['vl'] = np.clip(np.round(v[S_HIGH:] / V_REF * ADC_MAX_12), 0, ADC_MAX_12)
+        rec['t_high'], rec['totalLow1'], rec['totalLow'] = self.timing
+        R = float(pt1000_resistance(T))
+        rec['avgTherm'] = R / (R + R_REF) * ADC_MAX_10 + self.rng.normal(0.0, 0.05)
+        return rec.tobytes()
+
+
+class SimulatedTeensy:
+    """
+    Software Teensy running the optimized_tdischarge.txt command protocol.
+
+
+    Understands 'S', 'C', 'X', 'P' + uint32 and 'F' + uint8 exactly like the firmware and
+    answers with raw or framed DecayModel records. Each measurement takes the model's
+    sampling time plus CHARGE_S, scaled by time_scale (0 = as fast as possible), plus
+    latency_s and a uniform ±jitter_s. corrupt_prob flips one byte of a sent packet and
+    drop_prob discards a packet (its sequence number is still used), to exercise the
+    resynchronising reader. Bytes come in through feed() and go out through the output
+    callable; SimSerial and serve_pty connect those to a host.
+
+
+    Parameters:
+        model (DecayModel): Record generator; a default DecayModel if None.
+        time_scale (float): Factor on the real measurement time.
+        latency_s (float): Extra delay per packet (s).
+        jitter_s (float): Uniform random delay in [-jitter_s, jitter_s] per packet (s).
+        corrupt_prob (float): Probability of corrupting a packet.
+        drop_prob (float): Probability of dropping a packet.
+        seed (int): Random seed for the faults and timing.
+    """
+
+    def __init__(self, model=None, time_scale=1.0, latency_s=0.0, jitter_s=0.0,
+                 corrupt_prob=0.0, drop_prob=0.0, seed=None):
+        self.model = model if model is not None else DecayModel(seed=seed)
+        self.time_scale = float(time_scale)
+        self.latency_s = float(latency_s)
+        self.jitter_s = float(jitter_s)
+        self.corrupt_prob = float(corrupt_prob)
+        self.drop_prob = float(drop_prob)
+        self.rng = np.random.default_rng(seed)
+        self.output = None
+        self.framed = False
+        self.streaming = False
+        self.period_ms = 0
+        self.seq = 0
+        self.n_sent = 0
+        self._commands = bytearray()
+        self._requested = 0
+        self._next_start = 0.0
+        self._wake = threading.Condition()
+        self._closed = False
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='teensy-sim', daemon=True)
+
+    def start(self, output):
+        """Start answering commands, sending packets with output(bytes)."""
+        self.output = output
+        self._thread.start()
+        return self
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def feed(self, data):
+        """Bytes written by the host."""
+        with self._wake:
+            self._commands += data
+            self._wake.notify()
+
+    def _parse_commands(self):
+        """Apply complete commands in the input buffer (caller holds the lock)."""
+        buf = self._commands
+        while buf:
+            c = buf[0]
+            if c in b'PF':
+                size = 5 if c == ord('P') else 2
+                if len(buf) < size:
+                    return
+                if c == ord('P'):
+                    self.period_ms = int.from_bytes(buf[1:5], 'little')
+                else:
+                    self.framed = bool(buf[1])
+                del buf[:size]
+                continue
+            if c == ord('S') and not self.streaming:
+                self._requested += 1
+            elif c == ord('C'):
+                self.streaming = True
+                self._next_start = time.perf_counter()
+            elif c == ord('X'):
+                self.streaming = False
+            del buf[:1]
+
+    def _packet(self):
+        raw = self.model.record(time.perf_counter() - self._started_at)
+        if self.framed:
+            raw = encode_frame(raw, self.seq)
+            self.seq = (self.seq + 1) % 2**32
+        if self.rng.random() < self.drop_prob:
+            return None
+        if self.rng.random() < self.corrupt_prob:
+            raw = bytearray(raw)
+            raw[self.rng.integers(len(raw))] ^= 0xFF
+        return bytes(raw)
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while True:
+                    self._parse_commands()
+                    if self._closed:
+                        return
+                    now = time.perf_counter()
+                    if self._requested:
+                        self._requested -= 1
+                        break
+                    if self.streaming and now >= self._next_start:
+                        self._next_start = now + self.period_ms / 1000.0
+                        break
+                    timeout = self._next_start - now if self.streaming else None
+                    self._wake.wait(timeout)
+            delay = (self.model.duration_s + CHARGE_S) * self.time_scale + self.latency_s
+            delay += self.rng.uniform(-self.jitter_s, self.jitter_s) if self.jitter_s else 0.0
+            if delay > 0:
+                time.sleep(delay)
+            pkt = self._packet()
+            if pkt is not None:
+                self.output(pkt)
+                self.n_sent += 1
+
+
+class SimSerial:
+    """
+    In-process stand-in for serial.Serial connected to a SimulatedTeensy.
+
+
+    Supports the calls the acquisition scripts make: read (with timeout), write, in_waiting,
+    reset_input_buffer, setDTR, close and use as a context manager.
+
+
+    Parameters:
+        device (SimulatedTeensy): Simulated board; a default one if None.
+        timeout (float): Read timeout (s); None blocks until enough bytes arrive.
+    """
+
+    def __init__(self, device=None, timeout=5.0, **kwargs):
+        self.device = device if device is not None else SimulatedTeensy()
+        self.timeout = timeout
+        self._buf = bytearray()
+        self._ready = threading.Condition()
+        self.is_open = True
+        self.device.start(self._receive)
+
+    def _receive(self, data):
+        with self._ready:
+            self._buf += data
+            self._ready.notify_all()
+
+    @property
+    def in_waiting(self):
+        return len(self._buf)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._ready:
+            while len(self._buf) < size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._ready.wait(remaining)
+            out = bytes(self._buf[:size])
+            del self._buf[:size]
+        return out
+
+    def write(self, data):
+        self.device.feed(bytes(data))
+        return len(data)
+
+    def reset_input_buffer(self):
+        with self._ready:
+            self._buf.clear()
+
+    def setDTR(self, value=True):
+        pass
+
+    def close(self):
+        if self.is_open:
+            self.device.close()
+            self.is_open = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def serve_pty(device=None):
+    """
+    Expose a SimulatedTeensy on a pseudo-terminal (POSIX only).
+
+
+    Any program can then open the returned path as its serial port, e.g. set PORT in
+    automated_loop1.py or pass it to AcquisitionService.
+
+
+    Parameters:
+        device (SimulatedTeensy): Simulated board; a default one if None.
+
+
+    Returns:
+        tuple: (port path, SimulatedTeensy).
+    """
+    import tty
+
+    device = device if device is not None else SimulatedTeensy()
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+
+    def write_all(data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(master, view):]
+
+    def pump():
+        while True:
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            device.feed(data)
+
+    device.start(write_all)
+    threading.Thread(target=pump, name='teensy-sim-pty', daemon=True).start()
+    return path, device
+
+
+if __name__ == '__main__':
+    path, device = serve_pty(SimulatedTeensy(DecayModel(ramp_C_per_min=-2.0)))
+    print(f"Simulated Teensy on {path}; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"  {device.n_sent} packets sent")
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,156 @@
+from collections import namedtuple
+
+import numpy as np
+
+
+DELTA_T = 2.0  # default bin width (°C), as in the merge notebook
+
+# T_bin:  bin centre (°C)
+# T_mean: mean thermistor temperature of the records in the bin (°C)
+# count:  number of records
+# mean, std, sem: per-sample mean, standard deviation and standard error, shape (N,)
+# dts:    mean (dt_high, dt_low1, dt_low2) of the records in µs; the time axis is
+#         teensy_records.time_axis(dts). NaN when no timing was given.
+BinStats = namedtuple('BinStats', ['T_bin', 'T_mean', 'count', 'mean', 'std', 'sem', 'dts'])
+
+
+class TemperatureBins:
+    """
+    Streaming per-temperature-bin average of decay curves.
+
+
+    Each bin keeps a running count, mean and sum of squared deviations (Welford / Chan
+    update), so memory is O(n_bins × N) however many records are added, and the standard
+    error of every bin comes for free. Time bases are carried as a running mean of each
+    record's dt triple rather than as N-length time vectors. Records are assigned to delta_T * round(T / delta_T),
+    the binning used by the merge notebook; records with a non-finite T are ignored.
+
+
+    Parameters:
+        n_samples (int): Length N of every curve.
+        delta_T (float): Bin width (°C).
+    """
+
+    def __init__(self, n_samples, delta_T=DELTA_T):
+        self.n_samples = int(n_samples)
+        self.delta_T = float(delta_T)
+        self._bins = {}   # T_bin -> [count, T_sum, mean (N,), M2 (N,), dt_sum (3,)]
+
+    def bin_of(self, T):
+        """Bin centre(s) for temperature(s) T (°C)."""
+        return self.delta_T * np.round(np.asarray(T, dtype=float) / self.delta_T) + 0.0  # no -0.0 bin
+
+    def _merge(self, T_bin, count, T_sum, mean, M2, dt_sum):
+        """Combine a group's (count, T_sum, mean, M2, dt_sum) into bin T_bin (Chan et al.)."""
+        acc = self._bins.get(T_bin)
+        if acc is None:
+            self._bins[T_bin] = [count, T_sum, np.array(mean, dtype=float),
+                                 np.array(M2, dtype=float), np.array(dt_sum, dtype=float)]
+            return
+        n_a = acc[0]
+        n = n_a + count
+        delta = mean - acc[2]
+        acc[2] += delta * (count / n)
+        acc[3] += M2 + delta**2 * (n_a * count / n)
+        acc[0] = n
+        acc[1] += T_sum
+        acc[4] += dt_sum
+
+    def add(self, T, v, dts=None):
+        """
+        Add one record.
+
+
+        Parameters:
+            T (float): Record temperature (°C).
+            v (ndarray): Curve, shape (N,).
+            dts (sequence of float): Optional (dt_high, dt_low1, dt_low2) of the record (µs).
+        """
+        if not np.isfinite(T):
+            return
+        v = np.asarray(v, dtype=float)
+        dts = np.full(3, np.nan) if dts is None else np.asarray(dts, dtype=float)
+        self._merge(float(self.bin_of(T)), 1, float(T), v, np.zeros_like(v), dts)
+
+    def add_batch(self, T, V, dts=None):
+        """
+        Add a stack of records, updating each bin once per call.
+
+
+        Parameters:
+            T (ndarray): Record temperatures (°C), shape (n_records,).
+            V (ndarray): Curves, shape (n_records, N).
+            dts (ndarray): Optional dt triples of the records (µs), shape (n_records, 3).
+        """
+        T = np.asarray(T, dtype=float)
+        V = np.asarray(V)
+        dts = np.full((T.size, 3), np.nan) if dts is None else np.asarray(dts, dtype=float)
+        keep = np.isfinite(T)
+        T, V, dts = T[keep], V[keep], dts[keep]
+        bins = self.bin_of(T)
+        for T_bin in np.unique(bins):
+            sel = bins == T_bin
+            group = V[sel].astype(float)
+            mean = group.mean(axis=0)
+            M2 = ((group - mean)**2).sum(axis=0)
+            self._merge(float(T_bin), int(sel.sum()), float(T[sel].sum()), mean, M2,
+                        dts[sel].sum(axis=0))
+
+    def __len__(self):
+        return len(self._bins)
+
+    @property
+    def bins(self):
+        """Sorted bin centres (°C)."""
+        return sorted(self._bins)
+
+    def stats(self, T_bin):
+        """
+        Statistics of one bin.
+
+
+        Parameters:
+            T_bin (float): Bin centre (°C), one of self.bins.
+
+
+        Returns:
+            BinStats: Mean curve with its sample standard deviation and standard error.
+        """
+        count, T_sum, mean, M2, dt_sum = self._bins[T_bin]
+        var = M2 / (count - 1) if count > 1 else np.full_like(mean, np.nan)
+        std = np.sqrt(var)
+        return BinStats(T_bin, T_sum / count, count, mean.copy(), std, std / np.sqrt(count),
+                        dt_sum / count)
+
+    def summary(self):
+        """BinStats for every bin, coldest first."""
+        return [self.stats(T_bin) for T_bin in self.bins]
+
+    def state(self):
+        """
+        The accumulators as plain arrays, e.g. for np.savez; see from_state.
+
+
+        Returns:
+            dict: n_samples, delta_T and per-bin T_bin, count, T_sum, mean, M2 and dt_sum.
+        """
+        bins = self.bins
+        acc = [self._bins[T_bin] for T_bin in bins]
+        n = len(bins)
+        return dict(n_samples=self.n_samples, delta_T=self.delta_T,
+                    T_bin=np.array(bins, dtype=float),
+                    count=np.array([a[0] for a in acc], dtype=np.int64),
+                    T_sum=np.array([a[1] for a in acc], dtype=float),
+                    mean=np.array([a[2] for a in acc], dtype=float).reshape(n, self.n_samples),
+                    M2=np.array([a[3] for a in acc], dtype=float).reshape(n, self.n_samples),
+                    dt_sum=np.array([a[4] for a in acc], dtype=float).reshape(n, 3))
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an accumulator from state() (or the np.load of a file saved from it)."""
+        bins = cls(int(state['n_samples']), float(state['delta_T']))
+        for T_bin, count, T_sum, mean, M2, dt_sum in zip(state['T_bin'], state['count'], state['T_sum'],
+                                                         state['mean'], state['M2'], state['dt_sum']):
+            bins._bins[float(T_bin)] = [int(count), float(T_sum), np.array(mean, dtype=float),
+                                        np.array(M2, dtype=float), np.array(dt_sum, dtype=float)]
+        return bins
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import transform_dielectric_data as tdd
+from transform_dielectric_data import (V_debye_sim_batch, V_debye_sim_dense, get_J, get_J_binned,
+                                       get_J_dense, get_J_segments, get_kappa, get_kappa_dense)
+
+
+R = 1e6
+C0 = 22e-12
+DEBYE = {'k0': 3.0, 'Delta_k': 20.0, 'tau': 1e-4, 'rho': 1e9}
+N = 1024
+DT = 1e-6
+
+
+def grid(t0=0.0, n=N, dt=DT):
+    return t0 + dt * np.arange(n)
+
+
+def assert_close(a, b, rtol=1e-9):
+    """Agreement to rtol relative to the largest magnitude of the reference."""
+    np.testing.assert_allclose(a, b, rtol=rtol, atol=rtol * np.abs(b).max())
+
+
+@pytest.mark.parametrize('t0, path', [(0.0, 'fft'), (5 * DT, 'czt')])
+def test_get_J_matches_dense(monkeypatch, t0, path):
+    t = grid(t0)
+    V = V_debye_sim_dense(t, R, C0, **DEBYE)
+    calls = []
+    czt = tdd.czt
+    monkeypatch.setattr(tdd, 'czt', lambda *a, **k: calls.append(1) or czt(*a, **k))
+
+    W, J = get_J(t, V)
+    W_d, J_d = get_J_dense(t, V)
+    assert calls == ([] if path == 'fft' else [1])
+    assert_close(W, W_d)
+    assert_close(J, J_d)
+
+
+def test_get_J_stack_matches_single_curves():
+    t = grid()
+    V = V_debye_sim_dense(t, R, C0, **DEBYE)
+    _, J = get_J(t, np.stack([V, 2 * V]))
+    _, J1 = get_J_dense(t, V)
+    assert_close(J[0], J1)
+    assert_close(J[1], 2 * J1)
+
+
+def test_get_kappa_matches_dense():
+    t = grid()
+    V = V_debye_sim_dense(t, R, C0, **DEBYE)
+    _, kappa = get_kappa(t, V, R * C0)
+    _, kappa_d = get_kappa_dense(t, V, R * C0)
+    assert_close(kappa, kappa_d, rtol=1e-8)
+
+
+@pytest.mark.parametrize('t0', [0.0, 3 * DT])
+def test_V_debye_sim_batch_matches_dense(t0):
+    t = grid(t0)
+    tau = np.array([3e-5, 1e-4, 4e-4])
+    rho = np.array([1e8, 1e9, 1e10])
+    # a budget of one model per block exercises the blocking as well
+    V = V_debye_sim_batch(t, R, C0, DEBYE['k0'], DEBYE['Delta_k'], tau, rho, max_bytes=1)
+    assert V.shape == (3, N)
+    for i in range(3):
+        V_d = V_debye_sim_dense(t, R, C0, DEBYE['k0'], DEBYE['Delta_k'], tau[i], rho[i])
+        assert_close(V[i], V_d)
+
+
+def test_get_J_segments_single_segment_matches_get_J():
+    t = grid()
+    V = V_debye_sim_dense(t, R, C0, **DEBYE)
+    W, J = get_J_segments([(t, V)])
+    W_ref, J_ref = get_J(t, V)
+    assert_close(W, W_ref)
+    assert_close(J, J_ref)
+
+
+def test_get_J_binned_one_sample_per_bin_matches_get_J():
+    t = grid()
+    V = V_debye_sim_dense(t, R, C0, **DEBYE)
+    W, J = get_J_binned(t, V, np.full(N, DT), np.ones(N))
+    W_ref, J_ref = get_J(t, V)
+    assert_close(W, W_ref)
+    assert_close(J, J_ref)
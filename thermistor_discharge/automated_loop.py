@@ -1,9 +1,14 @@
+import io
 import serial
+import sys
 import time
 import os
 import numpy as np
 import struct
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from session_writer import SessionWriter  # shared module at the repo root
+
 PORT = 'COM9'
 BAUDRATE = 115200
 TIMEOUT = 5
@@ -16,14 +21,6 @@ OUTPUT_DIR = r'C:\Users\klipk\Downloads\raw_heatdata_logs'
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def get_next_indexed_filename(base='raw_binary', ext='bin'):
-    i = 1
-    while True:
-        path = os.path.join(OUTPUT_DIR, f"{base}{i}.{ext}")
-        if not os.path.exists(path):
-            return path, i
-        i += 1
-
 def get_teensy_raw(ser):
     ser.write(b'S')              # Trigger Teensy to start sampling
     time.sleep(0.05)             # Let it process the command
@@ -63,17 +60,15 @@ def get_teensy_binary_data(fp):
 
 def loop_log_raw_data():
     print("Logging loop started. Press Ctrl+C to stop.")
+    session = SessionWriter(OUTPUT_DIR, prefix='raw_binary', ext='.bin')  # scans OUTPUT_DIR once
     with serial.Serial(PORT, BAUDRATE, timeout=TIMEOUT) as ser:
         ser.setDTR(False)  # ← Don't reset Teensy
         time.sleep(1.0)    # Let Teensy fully boot just once
         while True:
             raw = get_teensy_raw(ser)
             if raw:
-                path, idx = get_next_indexed_filename()
-                with open(path, 'wb') as f:
-                    f.write(raw)
-                with open(path, 'rb') as f:
-                    temperature = get_teensy_binary_data(f)
+                temperature = get_teensy_binary_data(io.BytesIO(raw))
+                path, _, idx = session.write(raw, temperature)
                 print(f"[OK] Saved to {path} ({len(raw)} bytes): {temperature} degrees C")
             else:
                 print("[X] Skipped due to bad packet.")
@@ -1,5 +1,12 @@
+import functools
+
 import numpy as np
 import scipy.constants as scc
+from scipy.signal import czt
+
+
+SIM_MAX_BYTES = 256 * 2**20    # default work-array budget for V_debye_sim_batch
+PLAN_CACHE_SIZE = 32           # number of distinct time grids kept by get_transform_plan
 
 
 def sim_kappa(W, k0, Delta_k, tau, rho):
@@ -51,6 +58,71 @@ def V_debye_sim(t, R, C0, k0, Delta_k, tau, rho):
 
 
     The circuit model is a series RC voltage divider, with the capacitor containing the dielectric medium.
+    The odd-harmonic series is summed with an inverse FFT, so memory stays O(N).
+
+
+    Parameters:
+        t (ndarray): Uniform time array covering half of the square-wave period (seconds).
+        R (float): Resistance in series with the capacitor (Ω).
+        C0 (float): Capacitance of the empty capacitor (F).
+        k0 (float): High-frequency dielectric constant.
+        Delta_k (float): Dielectric relaxation strength.
+        tau (float): Debye relaxation time (seconds).
+        rho (float): Resistivity of the dielectric medium (Ω·m).
+
+
+    Returns:
+        ndarray: Simulated voltage across the capacitor over time t (V).
+    """
+    return V_debye_sim_batch(t, R, C0, k0, Delta_k, tau, rho)[0]
+
+
+def V_debye_sim_batch(t, R, C0, k0, Delta_k, tau, rho, max_bytes=SIM_MAX_BYTES):
+    """
+    Simulate many Debye voltage curves on one time grid within a fixed memory budget.
+
+
+    k0, Delta_k, tau and rho may be scalars or arrays; they are broadcast together and
+    flattened, giving one model curve per element. Models are synthesised in blocks sized
+    so the complex work arrays stay under max_bytes.
+
+
+    Parameters:
+        t (ndarray): Uniform time array covering half of the square-wave period (seconds).
+        R (float): Resistance in series with the capacitor (Ω).
+        C0 (float): Capacitance of the empty capacitor (F).
+        k0 (float or ndarray): High-frequency dielectric constant(s).
+        Delta_k (float or ndarray): Dielectric relaxation strength(s).
+        tau (float or ndarray): Debye relaxation time(s) (seconds).
+        rho (float or ndarray): Resistivity(ies) of the dielectric medium (Ω·m).
+        max_bytes (int): Approximate upper bound on temporary memory (bytes).
+
+
+    Returns:
+        ndarray: Simulated voltages, shape (n_models, N) (V).
+    """
+    k0, Delta_k, tau, rho = (np.ravel(p) for p in np.broadcast_arrays(k0, Delta_k, tau, rho))
+    N, T = get_NT(t)
+    W = 2 * np.pi * (2 * np.arange(N) + 1) / T     # Angular frequencies of odd harmonics
+    dt = t[1] - t[0]
+    w0 = 2 * np.pi / T                             # Fundamental angular frequency
+    b = -4 / (W * T)                               # Square wave Fourier coefficients
+    shift = b * np.exp(2j * w0 * t[0] * np.arange(N))  # Offset of the grid from t = 0
+    ramp = np.exp(1j * w0 * t)
+
+    rows = max(1, int(max_bytes // (4 * 16 * N)))  # ~4 complex128 work arrays per model
+    Vt = np.empty((k0.size, N))
+    for i in range(0, k0.size, rows):
+        sl = slice(i, i + rows)
+        C = C0 * sim_kappa(W, k0[sl, None], Delta_k[sl, None], tau[sl, None], rho[sl, None])
+        J = 1 / (1 + 1j * W * R * C)               # Transfer function of RC divider
+        Vt[sl] = np.imag(ramp * _odd_harmonic_sum(shift * J, 2 * w0 * dt, N))
+    return Vt
+
+
+def V_debye_sim_dense(t, R, C0, k0, Delta_k, tau, rho):
+    """
+    Reference O(N²) implementation of V_debye_sim using an explicit Fourier matrix.
 
 
     Parameters:
@@ -78,11 +150,270 @@ def V_debye_sim(t, R, C0, k0, Delta_k, tau, rho):
     return Vt
 
 
+def _odd_harmonic_sum(x, theta, m):
+    """
+    Evaluate sum_n x[..., n] * exp(1j * theta * n * k) for k = 0 .. m-1 along the last axis.
+
+
+    Uses a plain FFT when theta is the DFT step of the array length (time grid starting at
+    zero) and a chirp-z transform otherwise, so the cost is O(N log N) either way.
+
+
+    Parameters:
+        x (ndarray): Samples, transformed along the last axis.
+        theta (float): Phase step between neighbouring samples and harmonics (rad).
+        m (int): Number of output harmonics.
+
+
+    Returns:
+        ndarray: Complex sums with shape x.shape[:-1] + (m,).
+    """
+    n = x.shape[-1]
+    step = 2 * np.pi / n
+    if m <= n and np.isclose(theta, -step, rtol=1e-12, atol=0):
+        return np.fft.fft(x, axis=-1)[..., :m]
+    if m <= n and np.isclose(theta, step, rtol=1e-12, atol=0):
+        return n * np.fft.ifft(x, axis=-1)[..., :m]
+    return czt(x, m, w=np.exp(1j * theta), a=1.0, axis=-1)
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _transform_plan(N, t0, dt):
+    """
+    Build (and cache) the frequency grid and basis factors for one uniform time grid.
+
+
+    Parameters:
+        N (int): Number of points in the half-period.
+        t0 (float): First sample time (seconds).
+        dt (float): Sample spacing (seconds).
+
+
+    Returns:
+        tuple:
+            - W (ndarray): Angular frequencies of the N/2 kept odd harmonics (rad/s).
+            - ramp (ndarray): Phase ramp applied to V(t) before the FFT.
+            - scale (ndarray): Per-harmonic factor turning the FFT output into J(ω).
+            - theta (float): DFT phase step between samples and harmonics (rad).
+    """
+    T = 2 * (t0 + (N - 1) * dt + dt)                # Same period as get_NT
+    M = N // 2
+    W = 2 * np.pi * (2 * np.arange(M) + 1) / T     # Odd harmonics kept in the output
+    w0 = 2 * np.pi / T                             # Fundamental angular frequency
+    ramp = np.exp(-1j * w0 * dt * np.arange(N))
+    b = -4 / (W * T)                               # Fourier coefficients (square wave)
+    scale = np.exp(-1j * W * t0) * 1j * (4 / (2 * N)) / b
+    for arr in (W, ramp, scale):
+        arr.setflags(write=False)
+    return W, ramp, scale, -2 * w0 * dt
+
+
+def get_transform_plan(t):
+    """
+    Return the cached transform plan for time grid t (see _transform_plan).
+
+
+    Plans are keyed by (N, t[0], dt), so every curve sampled on the same grid reuses them.
+
+
+    Parameters:
+        t (ndarray): Uniform time array covering half of the square-wave period (seconds).
+
+
+    Returns:
+        tuple: (W, ramp, scale, theta) as returned by _transform_plan.
+    """
+    return _transform_plan(int(t.size), float(t[0]), float(t[1] - t[0]))
+
+
 def get_J(t, Vt):
     """
     Compute the frequency-dependent transfer function J(ω) from measured or simulated voltage.
 
 
+    FFT implementation of get_J_dense: the odd-harmonic basis exp(-iW t) factors into a
+    phase ramp times a DFT kernel, so no N×N matrix is built. Vt may also be a stack of
+    curves on the same grid, shape (n_curves, N).
+
+
+    Parameters:
+        t (ndarray): Uniform time array covering half of the square-wave period (seconds).
+        Vt (ndarray): Measured or simulated voltage across the capacitor (V).
+
+
+    Returns:
+        tuple:
+            - W (ndarray): Angular frequencies (rad/s).
+            - J (ndarray): Frequency-dependent complex transfer function.
+    """
+    W, ramp, scale, theta = get_transform_plan(t)
+    J = scale * _odd_harmonic_sum(np.asarray(Vt) * ramp, theta, W.size)
+    return W, J
+
+
+def piecewise_segments(Vt, lengths, dts, t0=0.0):
+    """
+    Split a record sampled at several uniform rates into contiguous (t, V) segments.
+
+
+    For the dual-rate Teensy record this is lengths=(50, 1200, 14800) with the
+    (dt_high, dt_low1, dt_low2) triple; each segment starts one dt after the previous one ends.
+
+
+    Parameters:
+        Vt (ndarray): Concatenated voltages, shape (..., sum(lengths)) (V).
+        lengths (sequence of int): Number of samples in each segment.
+        dts (sequence of float): Sample spacing of each segment (seconds).
+        t0 (float): Time of the first sample (seconds).
+
+
+    Returns:
+        list: (t, V) pairs, one per segment.
+    """
+    Vt = np.asarray(Vt)
+    segments = []
+    start = 0
+    for n, dt in zip(lengths, dts):
+        t = t0 + dt * np.arange(n)
+        segments.append((t, Vt[..., start:start + n]))
+        start += n
+        t0 = t0 + n * dt
+    return segments
+
+
+def get_J_segments(segments, n_harmonics=None):
+    """
+    Compute J(ω) from a record made of piecewise-uniform segments without resampling.
+
+
+    Each segment contributes dt_s * sum_n V_n exp(-iW t_n), evaluated with a chirp-z
+    transform at its native resolution. On a single uniform grid starting at t = 0 this
+    reduces to get_J.
+
+
+    Parameters:
+        segments (sequence): Contiguous (t, V) pairs in time order; each t is uniform with at
+            least two samples, and V may be (N_s,) or (n_curves, N_s).
+        n_harmonics (int): Number of odd harmonics to return (default: half the total samples).
+
+
+    Returns:
+        tuple:
+            - W (ndarray): Angular frequencies (rad/s).
+            - J (ndarray): Frequency-dependent complex transfer function.
+    """
+    segments = [(np.asarray(t, dtype=float), np.asarray(V)) for t, V in segments]
+    t_last = segments[-1][0]
+    T = 2 * (t_last[-1] + (t_last[1] - t_last[0]))  # Record ends one dt after its last sample
+    M = sum(t.size for t, _ in segments) // 2 if n_harmonics is None else int(n_harmonics)
+    W = 2 * np.pi * (2 * np.arange(M) + 1) / T
+    w0 = 2 * np.pi / T
+
+    S = 0
+    for t, V in segments:
+        dt = t[1] - t[0]
+        x = V * np.exp(-1j * w0 * dt * np.arange(t.size))
+        S = S + dt * np.exp(-1j * W * t[0]) * _odd_harmonic_sum(x, -2 * w0 * dt, M)
+    J = -1j * W * S                                # Same normalisation as get_J (b = -4 / (W T))
+    return W, J
+
+
+def get_kappa_segments(segments, RC, n_harmonics=None):
+    """
+    Calculate κ(ω) from a piecewise-uniform record (see get_J_segments).
+
+
+    Parameters:
+        segments (sequence): Contiguous (t, V) pairs in time order, e.g. from piecewise_segments.
+        RC (float): Product of series resistance R and empty capacitor capacitance C0 (seconds).
+        n_harmonics (int): Number of odd harmonics to return (default: half the total samples).
+
+
+    Returns:
+        tuple:
+            - W (ndarray): Angular frequencies (rad/s).
+            - kappa (ndarray): Complex dielectric function κ(ω).
+    """
+    W, J = get_J_segments(segments, n_harmonics)
+    kappa = (1 / J - 1) / (1j * W * RC)
+    return W, kappa
+
+
+def get_J_binned(t, Vt, widths, counts, n_harmonics=None):
+    """
+    Compute J(ω) from a record averaged into contiguous time bins, e.g. by log_resample.
+
+
+    Bin b holds counts_b samples spaced δ_b = widths_b / counts_b around its mean time t_b.
+    With V taken as constant within the bin, its part of the per-sample sum in
+    get_J_segments is V_b * δ_b * sum_k exp(-iW t_k), which is evaluated in closed form as
+    widths_b * exp(-iW t_b) * sin(counts_b x) / (counts_b sin x) with x = W δ_b / 2. Unlike
+    a plain sum at the bin times this does not alias where W δ_b is large, and with one
+    sample per bin it reduces to get_J_segments. Harmonics whose period is short compared
+    with the widest bins see V vary within a bin and lose accuracy, hence the default of
+    M / 2 harmonics.
+
+
+    Parameters:
+        t (ndarray): Mean time of every bin, shape (M,) (seconds).
+        Vt (ndarray): Bin voltages, shape (M,) or (n_curves, M) (V).
+        widths (ndarray): Time covered by every bin, shape (M,) (seconds); the bins tile
+            the record from t = 0.
+        counts (ndarray): Samples averaged into every bin, shape (M,).
+        n_harmonics (int): Number of odd harmonics to return (default: half the number of bins).
+
+
+    Returns:
+        tuple:
+            - W (ndarray): Angular frequencies (rad/s).
+            - J (ndarray): Frequency-dependent complex transfer function.
+    """
+    t = np.asarray(t, dtype=float)
+    widths = np.asarray(widths, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    T = 2 * widths.sum()                           # Record ends where the last bin ends
+    M = t.size // 2 if n_harmonics is None else int(n_harmonics)
+    W = 2 * np.pi * (2 * np.arange(M) + 1) / T
+
+    x = np.outer(widths / counts, W) / 2
+    sin_x = np.sin(x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        D = np.sin(counts[:, None] * x) / (counts[:, None] * sin_x)
+    D = np.where(np.abs(sin_x) < 1e-12, np.cos(x) ** (counts[:, None] - 1), D)  # x at a multiple of π
+    S = (np.asarray(Vt) * widths) @ (D * np.exp(-1j * np.outer(t, W)))
+    J = -1j * W * S                                # Same normalisation as get_J_segments
+    return W, J
+
+
+def get_kappa_binned(t, Vt, widths, counts, RC, n_harmonics=None):
+    """
+    Calculate κ(ω) from a binned record (see get_J_binned).
+
+
+    Parameters:
+        t (ndarray): Mean time of every bin, shape (M,) (seconds).
+        Vt (ndarray): Bin voltages, shape (M,) or (n_curves, M) (V).
+        widths (ndarray): Time covered by every bin, shape (M,) (seconds).
+        counts (ndarray): Samples averaged into every bin, shape (M,).
+        RC (float): Product of series resistance R and empty capacitor capacitance C0 (seconds).
+        n_harmonics (int): Number of odd harmonics to return (default: half the number of bins).
+
+
+    Returns:
+        tuple:
+            - W (ndarray): Angular frequencies (rad/s).
+            - kappa (ndarray): Complex dielectric function κ(ω).
+    """
+    W, J = get_J_binned(t, Vt, widths, counts, n_harmonics)
+    kappa = (1 / J - 1) / (1j * W * RC)
+    return W, kappa
+
+
+def get_J_dense(t, Vt):
+    """
+    Reference O(N²) implementation of get_J using an explicit Fourier matrix.
+
+
     Parameters:
         t (ndarray): Time array covering half of the square-wave period (seconds).
         Vt (ndarray): Measured or simulated voltage across the capacitor (V).
@@ -121,3 +452,50 @@ def get_kappa(t, Vt, RC):
     W, J = get_J(t, Vt)                                # Compute frequency response
     kappa = (1 / J - 1) / (1j * W * RC)                # Invert RC model to retrieve κ(ω)
     return W, kappa
+
+
+def get_kappa_batch(t, V, RC):
+    """
+    Calculate κ(ω) for a stack of voltage curves sharing one time grid.
+
+
+    The transform plan for t is computed once and cached, so repeated calls on the same
+    grid only pay for one FFT per curve.
+
+
+    Parameters:
+        t (ndarray): Uniform time array covering half of the square-wave period (seconds).
+        V (ndarray): Voltage curves, shape (n_curves, N) (V).
+        RC (float): Product of series resistance R and empty capacitor capacitance C0 (seconds).
+
+
+    Returns:
+        tuple:
+            - W (ndarray): Angular frequencies, shape (N/2,) (rad/s).
+            - kappa (ndarray): Complex dielectric functions, shape (n_curves, N/2).
+    """
+    V = np.atleast_2d(V)
+    if V.shape[-1] != t.size:
+        raise ValueError(f"Expected curves of length {t.size}, got shape {V.shape}")
+    return get_kappa(t, V, RC)
+
+
+def get_kappa_dense(t, Vt, RC):
+    """
+    Reference version of get_kappa built on get_J_dense (O(N²) memory); used to validate the FFT path.
+
+
+    Parameters:
+        t (ndarray): Time array covering half of the square-wave period (seconds).
+        Vt (ndarray): Measured or simulated voltage across the capacitor (V).
+        RC (float): Product of series resistance R and empty capacitor capacitance C0 (seconds).
+
+
+    Returns:
+        tuple:
+            - W (ndarray): Angular frequencies (rad/s).
+            - kappa (ndarray): Complex dielectric function κ(ω).
+    """
+    W, J = get_J_dense(t, Vt)
+    kappa = (1 / J - 1) / (1j * W * RC)
+    return W, kappa